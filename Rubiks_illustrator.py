@@ -2,111 +2,280 @@
 """
 #!/usr/bin/env python3
 # ===============================
-import sys, getopt
+import os, sys, getopt
+import atexit
+import logging
+from functools import partial
+
+import numpy as np
 
 from structure import *
-from sketch import display
+# The plotting stack (sketch.display, matplotlib, cv2) is imported only
+# when something is rendered, so pure-state runs start fast
 
-def Rubiks(twists):
-    """Parse Rubik's Cube notation into a list of moves."""
+def Rubiks(twists, n=3):
+    """Parse Rubik's Cube notation into a list of moves for an n x n x n cube."""
     # Check if argv is a list or a string
     if isinstance(twists, list):
         # If it's a list (like from sys.argv), join it
-        notation_string = ''.join(argv)
+        notation_string = ''.join(twists)
     else:
         # If it's already a string
         notation_string = twists
         
-    moves = []
-    i = 0
-    while i < len(notation_string):
-        # Get the current character (face)
-        char = notation_string[i]
-        i += 1
-        
-        # Skip non-alphabetic characters
-        if not char.isalpha():
-            continue
-            
-        # Keep the face as is (uppercase or lowercase matters in Rubik's notation)
-        face = char
-        
-        # For slice turns (M, E, S), the default direction is counterclockwise
-        if face in "BDLME":
-            direction = 'ccw'  # Default for M, E, S is counterclockwise
-        else:
-            direction = 'cw'  # Default for all other moves is clockwise
-            
-        # Check for prime symbol (') which indicates the opposite of default direction
-        if i < len(notation_string) and notation_string[i] == "!":
-            # Flip the direction
-            direction = 'cw' if direction == 'ccw' else 'ccw'
-            i += 1
-            
-        # Check for repetition
-        repetitions = 1
-        if i < len(notation_string) and notation_string[i].isdigit():
-            repetitions = int(notation_string[i])
-            i += 1
-            
-        # Add the move(s) to the list
-        for _ in range(repetitions):
-            moves.append((face, direction))
-            
-    return moves
+    return parse_algorithm(notation_string, n)
+
+def write_profile(filename):
+    """Write the Chrome trace of this run and print the time spent per stage."""
+    profiler = get_profiler()
+    profiler.write(filename)
+    for line in format_summary(profiler):
+        print(line)
+    print('profile', filename)
 
 def main(argv):
     fur = None
     turns = ''
     outfile = False
-    cleanfile = False
+    jobs = 1
+    video_options = {}
+    batch = None
+    outdir = '.'
+    render = True
+    solve_cube = False
+    analyze = False
+    image_format = 'png'
+    log_level = logging.WARNING
+    profile_file = None
+    size = 3
+    scrambles = 0
+    scramble_length = 0
+    seed = None
+    facelets = None
+    net = False
     
-    optlist, args = getopt.getopt(argv, "vx:t:co")
+    optlist, args = getopt.getopt(argv, "vqx:t:coj:b:san:",
+                                  ["verbose", "quiet", "profile=", "cube=", "upfront=", "twist=", "clean", "output", "jobs=",
+                                   "format=", "fps=", "size=", "codec=", "video=",
+                                   "batch=", "outdir=", "no-render", "solve", "analyze", "no-cache", "image=", "tween=",
+                                   "scramble=", "scramble-length=", "seed=", "facelets=", "net"])
 
     for o, a in optlist:
       if o in ("-v", "--verbose"):
-        vb = True
+          log_level = logging.DEBUG
+      elif o in ("-q", "--quiet"):
+          log_level = logging.ERROR
+      elif o == "--profile":
+          profile_file = a
+      elif o in ("-n", "--cube"):
+          size = int(a)
       elif o in ("-x", "--upfront"):
           fur  = a               
       elif o in ("-t", "--twist"):
           turns = a               
       elif o in ("-c", "--clean"):
-          cleanfile = True
+          # Kept for compatibility: no intermediate files are written any more
+          pass
       elif o in ("-o", "--output"):
           outfile = True
+      elif o in ("-j", "--jobs"):
+          jobs = int(a)
+      elif o == "--format":
+          video_options['fmt'] = a
+      elif o == "--fps":
+          video_options['fps'] = float(a)
+      elif o == "--size":
+          video_options['size'] = tuple(int(x) for x in a.lower().split('x'))
+      elif o == "--codec":
+          video_options['codec'] = a
+      elif o == "--video":
+          video_options['filename'] = a
+      elif o == "--tween":
+          video_options['tween'] = int(a)
+      elif o in ("-b", "--batch"):
+          batch = a
+      elif o == "--outdir":
+          outdir = a
+      elif o == "--no-render":
+          render = False
+      elif o in ("-s", "--solve"):
+          solve_cube = True
+      elif o in ("-a", "--analyze"):
+          analyze = True
+      elif o == "--image":
+          image_format = a.lower()
+      elif o == "--scramble":
+          scrambles = int(a)
+      elif o == "--scramble-length":
+          scramble_length = int(a)
+      elif o == "--seed":
+          seed = int(a)
+      elif o == "--facelets":
+          facelets = a
+      elif o == "--net":
+          net = True
+      elif o == "--no-cache":
+          # Read by sketch.cache, in this process and in the render workers
+          os.environ['RUBIKS_RENDER_CACHE'] = 'off'
+
+    if size < 2:
+        print(f'-n {size}: a cube has at least 2 layers')
+        return
+
+    # Debug output of the geometry, moves and frames only with -v
+    logging.basicConfig(level=log_level, format='%(name)s: %(message)s')
+    if profile_file:
+        enable_profiling()
+        atexit.register(write_profile, profile_file)
+
+    imported = None
+    if facelets:
+        # The letters are colored after the -x corner, RWB by default
+        fur = fur or 'RWB'
+        if fur not in CORNER_COLORS:
+            print(f'unknown corner: {fur}')
+            return
+        try:
+            imported = facelets_to_state(facelets, fur)
+        except ValueError as error:
+            # Wrong length or unknown letters
+            print('invalid facelets:', error)
+            return
+        # The size of an imported cube is that of its facelet string
+        size = cube_size(len(imported))
+
+    if scrambles:
+        # One scramble per line, uniformly random states unless a length is given
+        rng = np.random.default_rng(seed)
+        for _ in range(scrambles):
+            if scramble_length:
+                print(random_scramble(scramble_length, rng))
+            else:
+                print(random_state_scramble(rng))
+        return
+
+    if size != 3 and (batch or solve_cube or analyze):
+        # The manifests, the solver and the cycle analysis are for the 3x3 cube
+        print('-b, --solve and --analyze only apply to a 3x3 cube')
+        return
+
+    if batch:
+        entries = read_manifest(batch, default_fur=fur or 'RWB')
+        if analyze:
+            # Order and cycles of every entry, without drawing anything
+            for result in analyze_catalog(entries):
+                if 'error' in result:
+                    print(f"invalid twists: {result['error']}, skipping {result['name'] or result['twists']}")
+                    continue
+                print(f"{result['order']:>6}  {result['name'] or result['twists']}: {result['notation']}")
+            return
+        # Render every entry of the manifest in this process (or its workers)
+        from sketch import gallery
+        video_options.pop('filename', None)
+        gallery.render_gallery(entries, outdir, jobs=jobs, animate=outfile, video_options=video_options,
+                               image_format=image_format)
+        return
     
-    moves_list = Rubiks(turns)
-    print(f"Parsed {len(moves_list)} moves: {moves_list}")
+    try:
+        moves_list = Rubiks(turns, size)
+    except ValueError as error:
+        # Unknown letters, or layers this cube does not have
+        print('invalid twists:', error)
+        return
+    print(f"Parsed {len(moves_list)} moves")
+    logging.debug('moves %s', moves_list)
     print('FUR', fur) 
 
     corner=[]
       
     # Initialize the cube
 
-    cube, face_colors, corner = framesetup.initialize_cube(orientation_code = fur) 
-    points_after_url, colors_after_url, outergroups, centerpieces = framesetup.generate_initial_points(corner)
-    display.create_rubiks_diagram(points_after_url, colors_after_url,fur,'start')
+    cube, face_colors, corner = framesetup.initialize_cube(orientation_code = fur, n = size)
+    points_after_url, colors_after_url, outergroups, centerpieces = framesetup.generate_initial_points(corner, size)
+    if imported is not None:
+        # Start from the imported state instead of the solved cube
+        colors_after_url = imported
+    framesetup.get_move_tables(points_after_url, centerpieces)
+    # End state of the whole algorithm: one gather with the compiled permutation
+    final_colors = colors_after_url[compile_algorithm(turns, size)]
+
+    if analyze:
+        analysis = analyze_algorithm(turns)
+        print('order', analysis['order'])
+        print('cycles', analysis['notation'] or '(identity)')
+
+    if solve_cube and not is_solvable(final_colors):
+        # An imported cube can be assembled wrong
+        failed = [name for name, passed in validate_states(final_colors).items() if not passed[0]]
+        print('not solvable: ' + ', '.join(failed))
+        return
+
+    if solve_cube:
+        # Illustrate the twists followed by their solution, back to solved
+        solution = solve(final_colors)
+        print('solution', solution or '(already solved)', f'({sum(char in SOLVER_FACES for char in solution)} moves)')
+        turns += solution
+        moves_list = Rubiks(turns)
+        final_colors = colors_after_url[compile_algorithm(turns)]
 
-    if len(moves_list) > 0:
+    if not render:
+        # Pure-state mode: print the end state, never touch the plotting stack
+        print('state', state_string(final_colors))
+        print('hash', f'{state_hash(final_colors):016x}')
+        # Same for every rotated or recolored copy of the pattern
+        if size == 3:
+            print('canonical', f'{canonical_hash(final_colors):016x}')
+        try:
+            print('facelets', state_to_facelets(final_colors, None if size % 2 else fur))
+        except ValueError as error:
+            # An imported cube whose centers do not name six faces
+            print('facelets:', error)
+    else:
+        if outfile or net or image_format == 'png':
+            from sketch import display
+        if image_format == 'png':
+            create_diagram = partial(display.create_rubiks_diagram, label=fur)
+        else:
+            # SVG and PDF are written directly, without matplotlib
+            from sketch import svg
+            create_diagram = partial(svg.create_vector_diagram, fmt=image_format)
+        create_diagram(points_after_url, colors_after_url, 0, 'start')
+        # The 2D net of every diagram, with the magic numbers of the stickers on a 3x3
+        views = CubeViews(colors_after_url) if net else None
+        if views:
+            display.save_net(views.net(), 'net_frame_000.png', views.label_net(), 'start')
+
+    if render and len(moves_list) > 0:
         if outfile:
-            display.create_animation( fur, moves_list, twists = turns, cleanfile= cleanfile) # output_filename=output, fps=1,
+            filename = display.create_animation( fur, moves_list, twists = turns, jobs= jobs,
+                                               n = size, initial_colors = colors_after_url, **video_options)
+            print('video', filename)
         else:
-            for move in moves_list:
-                print(move)
-                points_after_url, colors_after_url = framesetup.perform_moves(
-                    points_after_url, colors_after_url,
-                    [move], outergroups,centerpieces
-                    ) 
-                display.create_rubiks_diagram(points_after_url, colors_after_url, fur, subtext)
-
-        # check 6x9 cubelets color
-    unique_colors = np.unique(colors_after_url)
-    color_counts = {color: colors_after_url.count(color) for color in unique_colors}
-    print(color_counts)
-    for color in unique_colors: 
-        if colors_after_url.count(color) != 9:
-            print(color, 'error color count')
-        else: print (color, 'OK')        
+            for n, move in enumerate(moves_list, start=1):
+                logging.debug('move %s', move)
+                if views:
+                    # One move on the shared state, for the diagram and the net
+                    colors_after_url = views.apply([move]).colors
+                else:
+                    points_after_url, colors_after_url = framesetup.perform_moves(
+                        points_after_url, colors_after_url,
+                        [move], outergroups,centerpieces
+                        ) 
+                create_diagram(points_after_url, colors_after_url, n, subtext)
+                if views:
+                    display.save_net(views.net(), f'net_frame_{n:03d}.png', views.label_net(), subtext)
+
+        # check 6x9 cubelets color (6 x n^2 on bigger cubes)
+    counts = color_counts(final_colors)
+    print({get_color_name(code): int(count) for code, count in enumerate(counts)})
+    for code, count in enumerate(counts): 
+        if count != size * size:
+            print(get_color_name(code), 'error color count')
+        else: print (get_color_name(code), 'OK')        
+    if size == 3:
+        # The colors can be right and the cube still unsolvable (a twisted corner, a flipped edge)
+        failed = [name for name, passed in validate_states(final_colors).items() if not passed[0]]
+        print('solvable' if not failed else 'not solvable: ' + ', '.join(failed))
     return 
 # =======================================================
 if __name__ == "__main__":
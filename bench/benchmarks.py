@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Benchmarks of parsing, moves, geometry and rendering
+#
+#   python bench/benchmarks.py [-r runs] [-k filter] [-o results.json]
+#                              [-b baseline.json] [--tolerance 0.25]
+#                              [--save-baseline] [--no-render]
+#
+# Every case is timed in `runs` samples of at least 50 ms, in this
+# process and after a warm-up call, and the median time per unit (move,
+# entry, frame...) is kept. The results are compared with
+# bench/baseline.json (or -b FILE) when it exists: a case slower than
+# baseline * (1 + tolerance) is a regression, and the exit status is 1.
+# =====================================================================
+import contextlib
+import getopt
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from structure import *
+from Rubiks_illustrator import Rubiks
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'bench', 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# Shortest duration of one timed sample; fast cases are called in a loop to reach it
+MIN_SAMPLE_SECONDS = 0.05
+
+def measure(function, runs, units=1):
+    """
+    Median and best time per unit over `runs` samples; output is discarded.
+
+    A first call warms the caches up and tells how many calls make a sample
+    of at least MIN_SAMPLE_SECONDS.
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        function()
+        loops = max(1, int(MIN_SAMPLE_SECONDS / max(time.perf_counter() - start, 1e-9)))
+        for _ in range(runs):
+            start = time.perf_counter()
+            for _ in range(loops):
+                function()
+            times.append((time.perf_counter() - start) / (loops * units))
+    return {'seconds': statistics.median(times), 'best': min(times), 'runs': runs, 'loops': loops}
+
+def initial_points(fur, n=3):
+    """generate_initial_points for a corner given by its FUR colors, e.g. 'RWB'."""
+    face_colors = get_face_colors(fur)
+    return framesetup.generate_initial_points([face_colors[5], face_colors[2], face_colors[0]], n)
+
+def state_cases(catalog, scramble):
+    """name -> (function, units, unit) of the cases that never draw."""
+    corners = list(CORNER_COLORS)
+    points, colors, outergroups, centerpieces = initial_points('RWB')
+    single_moves = [(face, direction) for face in SCRAMBLE_FACES for direction in ('cw', 'ccw')]
+    scramble_moves = parse_algorithm(scramble)
+    # The same scramble on a 7x7x7 cube, with wide moves: it should cost about as much per move
+    big = initial_points('RWB', 7)
+    big_moves = parse_algorithm(scramble.replace('M', '3Rw').replace('E', '2Uw').replace('S', '3F'))
+    random_corpus = random_states(1 << 16, rng=np.random.default_rng(2024))
+
+    def parse_catalog():
+        for entry in catalog:
+            Rubiks(entry['twists'])
+
+    def all_corners():
+        for fur in corners:
+            initial_points(fur)
+
+    def single_move():
+        for move in single_moves:
+            framesetup.perform_moves(points, colors, [move], outergroups, centerpieces)
+
+    def compile_catalog():
+        compile_algorithm.cache_clear()
+        for entry in catalog:
+            compile_algorithm(entry['twists'])
+
+    return {
+        'parse catalog': (parse_catalog, len(catalog), 'entry'),
+        'parse 1000-move scramble': (lambda: Rubiks(scramble), 1, 'scramble'),
+        'build_geometry': (framesetup.build_geometry, 1, 'call'),
+        'generate_initial_points': (all_corners, len(corners), 'corner'),
+        'build_move_tables': (lambda: framesetup.build_move_tables(points, centerpieces), 1, 'call'),
+        'perform_moves single move': (single_move, len(single_moves), 'move'),
+        'perform_moves 1000-move scramble': (
+            lambda: framesetup.perform_moves(points, colors, scramble_moves, outergroups, centerpieces),
+            1, 'scramble'),
+        'perform_moves 1000-move 7x7 scramble': (
+            lambda: framesetup.perform_moves(big[0], big[1], big_moves, big[2], big[3]), 1, 'scramble'),
+        'compile_algorithm catalog': (compile_catalog, len(catalog), 'entry'),
+        'random_states': (lambda: random_states(len(random_corpus)), len(random_corpus), 'state'),
+        'validate_states': (lambda: validate_states(random_corpus), len(random_corpus), 'state'),
+        }
+
+def render_cases(catalog, short_scramble, folder):
+    """name -> (function, units, unit) of the drawing cases, writing into folder."""
+    from sketch import cache, display
+    # Time the drawing itself, not the render cache
+    cache.configure_render_cache(enabled=False)
+    points, colors, outergroups, centerpieces = initial_points('RWB')
+    end_states = [colors[compile_algorithm(entry['twists'])] for entry in catalog]
+    entry = catalog[0]
+
+    def diagrams():
+        # create_rubiks_diagram writes circle_frame_NNN.png in the working directory
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            for n, state in enumerate(end_states):
+                display.create_rubiks_diagram(points, state, n, 'bench')
+        finally:
+            os.chdir(cwd)
+
+    def animation(twists):
+        moves = parse_algorithm(twists)
+        return lambda: display.create_animation('RWB', moves, twists, filename=os.path.join(folder, 'bench.mp4'))
+
+    return {
+        'create_rubiks_diagram': (diagrams, len(end_states), 'frame'),
+        'create_animation catalog entry': (animation(entry['twists']), 1, 'video'),
+        'create_animation 40-move scramble': (animation(short_scramble), 1, 'video'),
+        }
+
+def compare(results, baseline, tolerance):
+    """Ratio to the baseline of every case in both, and the names of the regressions."""
+    ratios, regressions = {}, []
+    for name, result in results.items():
+        reference = baseline.get('cases', {}).get(name)
+        if not reference:
+            continue
+        ratios[name] = result['seconds'] / reference['seconds']
+        if ratios[name] > 1 + tolerance:
+            regressions.append(name)
+    return ratios, regressions
+
+def main(argv):
+    runs = 5
+    selection = ''
+    output = None
+    baseline_file = None
+    tolerance = DEFAULT_TOLERANCE
+    save_baseline = False
+    render = True
+
+    optlist, args = getopt.getopt(argv, "r:k:o:b:", ["runs=", "filter=", "output=", "baseline=",
+                                                    "tolerance=", "save-baseline", "no-render"])
+    for o, a in optlist:
+        if o in ("-r", "--runs"):
+            runs = int(a)
+        elif o in ("-k", "--filter"):
+            selection = a
+        elif o in ("-o", "--output"):
+            output = a
+        elif o in ("-b", "--baseline"):
+            baseline_file = a
+        elif o == "--tolerance":
+            tolerance = float(a)
+        elif o == "--save-baseline":
+            save_baseline = True
+        elif o == "--no-render":
+            render = False
+
+    catalog = read_algorithm_table()
+    rng = np.random.default_rng(2024)
+    scramble = random_scramble(1000, rng)
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The move tables are built once, before any timing
+        framesetup.get_move_tables()
+        framesetup.get_cube_tables(7)
+
+    with tempfile.TemporaryDirectory() as folder:
+        cases = state_cases(catalog, scramble)
+        if render:
+            cases.update(render_cases(catalog, random_scramble(40, rng), folder))
+        results = {}
+        for name, (function, units, unit) in cases.items():
+            if selection not in name:
+                continue
+            results[name] = dict(measure(function, runs, units), unit=unit)
+            print(f"{name:<36}{results[name]['seconds'] * 1000:10.3f} ms/{unit}", flush=True)
+
+    report = {'python': platform.python_version(), 'numpy': np.__version__,
+              'machine': platform.machine(), 'cases': results}
+
+    baseline_file = baseline_file or DEFAULT_BASELINE
+    regressions = []
+    if save_baseline:
+        with open(baseline_file, 'w', encoding='utf-8') as target:
+            json.dump(report, target, indent=1)
+        print('baseline saved to', baseline_file)
+    elif os.path.exists(baseline_file):
+        with open(baseline_file, encoding='utf-8') as source:
+            ratios, regressions = compare(results, json.load(source), tolerance)
+        report['baseline'] = {'file': baseline_file, 'tolerance': tolerance, 'ratios': ratios,
+                              'regressions': regressions}
+        print(f'compared with {baseline_file} (tolerance {tolerance:.0%})')
+        for name, ratio in ratios.items():
+            print(f"{name:<36}{ratio:8.2f}x{'  REGRESSION' if name in regressions else ''}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as target:
+            json.dump(report, target, indent=1)
+    else:
+        print(json.dumps(report))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
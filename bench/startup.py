@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Startup-time benchmark: wall time and import cost of the CLI
+#
+#   python bench/startup.py [runs]
+#
+# Every case runs in a fresh interpreter; the best of `runs` is kept.
+# =====================================================================
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> python arguments, run from the project root
+CASES = {
+    'python': ['-c', 'pass'],
+    'import structure': ['-c', 'import structure'],
+    'import sketch.display': ['-c', 'import sketch.display'],
+    'cli --no-render': ['Rubiks_illustrator.py', '-x', 'RWB', '-t', 'R2L2U2D2F2B2', '--no-render'],
+}
+
+# Modules that a pure-state run must not load
+HEAVY_MODULES = ('matplotlib', 'cv2', 'PIL')
+
+def time_case(arguments, runs):
+    """Best wall time of `runs` fresh interpreters running the arguments."""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, env=dict(os.environ, MPLBACKEND='Agg'))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def heavy_imports():
+    """Heavy modules loaded by a --no-render run (should be none)."""
+    probe = ('import sys, runpy; sys.argv = ["Rubiks_illustrator.py", "-x", "RWB", "-t", "RU", "--no-render"]; '
+             'runpy.run_path("Rubiks_illustrator.py", run_name="__main__"); '
+             f'print("heavy:" + ",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout.splitlines()
+    line = [line for line in output if line.startswith('heavy:')][-1]
+    return [module for module in line[len('heavy:'):].split(',') if module]
+
+def main(argv):
+    runs = int(argv[0]) if argv else 5
+    results = {name: time_case(arguments, runs) for name, arguments in CASES.items()}
+    for name, seconds in results.items():
+        print(f'{name:<24}{seconds * 1000:8.1f} ms')
+    loaded = heavy_imports()
+    print('heavy modules in --no-render:', ', '.join(loaded) or 'none')
+    print(json.dumps({'startup_seconds': results, 'no_render_heavy_modules': loaded}))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Content-addressed render cache: a rendered state is never drawn twice
+# =====================================================================
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from structure.instrument import count
+
+# Environment variables: cache folder ('off' disables the cache) and its size in MB
+RENDER_CACHE_ENV = 'RUBIKS_RENDER_CACHE'
+RENDER_CACHE_SIZE_ENV = 'RUBIKS_RENDER_CACHE_MB'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'rubiks_illustrator', 'renders')
+DEFAULT_CACHE_MB = 256
+
+class RenderCache:
+    """
+    Folder of rendered images named by the hash of everything that went into them.
+
+    Entries are files under <folder>/<2 hex>/<hash>.<ext>. Reading an entry
+    refreshes its modification time, and when the folder grows over
+    max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_CACHE_MB * 2**20):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.total = None  # bytes in the folder, counted on the first store
+
+    @staticmethod
+    def key(*parts):
+        """Hex digest of the parts (bytes, arrays, or anything with a stable str)."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                part = part.tobytes()
+            elif not isinstance(part, bytes):
+                part = repr(part).encode('utf-8')
+            # Length prefix, so that ('ab', 'c') and ('a', 'bc') differ
+            digest.update(len(part).to_bytes(8, 'little'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def path(self, key, ext):
+        return os.path.join(self.folder, key[:2], f'{key}.{ext}')
+
+    def lookup(self, key, ext):
+        """Path of a cached entry, None on a miss; a hit counts as a use."""
+        path = self.path(key, ext)
+        try:
+            os.utime(path)
+        except OSError:
+            count('render cache misses')
+            return None
+        count('render cache hits')
+        return path
+
+    def fetch(self, key, filename):
+        """Copy a cached file to filename; False on a miss."""
+        path = self.lookup(key, os.path.splitext(filename)[1].lstrip('.'))
+        if path is None:
+            return False
+        shutil.copyfile(path, filename)
+        return True
+
+    def store(self, key, filename):
+        """Add a rendered file to the cache."""
+        with open(filename, 'rb') as source:
+            self._write(key, os.path.splitext(filename)[1].lstrip('.'), source.read())
+
+    def load_frame(self, key):
+        """Cached RGB frame, None on a miss."""
+        path = self.lookup(key, 'npz')
+        if path is None:
+            return None
+        with np.load(path) as data:
+            return data['frame']
+
+    def store_frame(self, key, frame):
+        """Add a rendered RGB frame to the cache, compressed."""
+        with tempfile.SpooledTemporaryFile() as buffer:
+            np.savez_compressed(buffer, frame=frame)
+            buffer.seek(0)
+            self._write(key, 'npz', buffer.read())
+
+    def _write(self, key, ext, data):
+        path = self.path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so that a concurrent reader never sees half a file
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(handle, 'wb') as target:
+            target.write(data)
+        os.replace(temporary, path)
+        if self.total is None:
+            self.total = sum(size for _, size, _ in self._entries())
+        else:
+            self.total += len(data)
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """(path, size, mtime) of every cached file."""
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self, target=0.9):
+        """Delete the least recently used entries until the cache is under target * max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.total <= target * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total -= size
+
+# Cache of this process, set up by get_render_cache() or configure_render_cache()
+_render_cache = None
+_configured = False
+
+def configure_render_cache(folder=None, max_mb=None, enabled=True):
+    """
+    Set up the render cache of this process.
+
+    :param folder: cache folder, default from RUBIKS_RENDER_CACHE or ~/.cache/rubiks_illustrator/renders
+    :param max_mb: size bound in MB, default from RUBIKS_RENDER_CACHE_MB or 256
+    :param enabled: False turns the cache off
+    """
+    global _render_cache, _configured
+    folder = folder or os.environ.get(RENDER_CACHE_ENV) or DEFAULT_CACHE_DIR
+    if max_mb is None:
+        max_mb = float(os.environ.get(RENDER_CACHE_SIZE_ENV, DEFAULT_CACHE_MB))
+    if not enabled or folder.lower() == 'off':
+        _render_cache = None
+    else:
+        _render_cache = RenderCache(folder, int(max_mb * 2**20))
+    _configured = True
+    return _render_cache
+
+def get_render_cache():
+    """Render cache of this process, None when it is disabled."""
+    if not _configured:
+        configure_render_cache()
+    return _render_cache
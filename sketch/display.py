@@ -1,210 +1,506 @@
 # -*- coding: utf-8 -*-
 #!/usr/bin/env python
 # =====================================================================
-import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
-from mpl_toolkits.mplot3d import Axes3D
-import cv2
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba_array
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle, Rectangle
 
 from structure import *
+from structure.instrument import profiled
+from . import video
+from .cache import RenderCache, get_render_cache
+from .style import *
+
+logger = logging.getLogger(__name__)
 # =====================================================================
 
-def get_color_map():
-    """Return a mapping of color indices to RGB values."""
-    return {
-        0: (1.0, 1.0, 1.0),  # White
-        1: (1.0, 1.0, 0.0),  # Yellow
-        2: (0.0, 1.0, 0.0),  # Green
-        3: (0.0, 0.0, 1.0),  # Blue
-        4: (1.0, 0.5, 0.0),  # Orange
-        5: (1.0, 0.0, 0.0)   # Red
-    }
+# Cell of every face in the 3 x 4 grid of the 2D net, in initialize_cube's face order
+NET_CELLS = ((0, 1), (2, 1), (1, 1), (1, 3), (1, 0), (1, 2))
+FACE_LABELS_2D = ("Up", "Down", "Front", "Back", "Left", "Right")
 
-def display_cube(cube, orientation_code=None):
+def draw_net(figure, cube, labels=None):
     """
-    Display a 2D representation of the cube state.
-    
-    Args:
-        cube (np.ndarray): The cube state
-        orientation_code (str, optional): The orientation code used to initialize the cube
+    Draw the 2D net of a cube on a figure, one subplot per face.
+
+    :param cube: (6, n, n) color codes, faces in initialize_cube's order,
+                 e.g. CubeViews.net() or state_to_faces(colors)
+    :param labels: optional (6, n, n) numbers written on the stickers,
+                   e.g. CubeViews.label_net()
     """
-    # Color map for display
-    color_map = get_color_map()
-    
-    # Create a figure with a grid layout
-    fig, axs = plt.subplots(3, 4, figsize=(8, 6))
-    
-    # Remove axes and set aspect ratio
+    n = cube.shape[1]
+    axs = figure.subplots(3, 4)
     for ax in axs.flat:
         ax.set_aspect('equal')
         ax.axis('off')
-    
-    # Hide unused subplots
-    axs[0, 0].set_visible(False)
-    axs[0, 2].set_visible(False)
-    axs[0, 3].set_visible(False)
-    axs[2, 0].set_visible(False)
-    axs[2, 2].set_visible(False)
-    axs[2, 3].set_visible(False)
-    
-    # Display each face
-    faces = {
-        (0, 1): 0,  # Up
-        (1, 1): 2,  # Front
-        (1, 0): 4,  # Left
-        (1, 2): 5,  # Right
-        (1, 3): 3,  # Back
-        (2, 1): 1   # Down
-    }
-    
-    # Get face labels
-    face_labels = ["Up", "Down", "Front", "Back", "Left", "Right"]
-    
-    # Add orientation info to title if provided
-    if orientation_code:
-        up_color = get_color_name(int(orientation_code[0]))
-        front_color = get_color_name(int(orientation_code[1]))
-        plt.suptitle(f"Cube Orientation: {orientation_code} ({up_color} UP, {front_color} FRONT)")
-    
-    for (row, col), face_idx in faces.items():
+    for face_idx, (row, col) in enumerate(NET_CELLS):
         ax = axs[row, col]
         face = cube[face_idx]
-        
         # Draw a grid of colored squares
-        for i in range(3):
-            for j in range(3):
-                color_idx = face[i, j]
-                color = color_map.get(color_idx, (0.5, 0.5, 0.5))  # Default to gray
-                ax.add_patch(plt.Rectangle((j, 2-i), 1, 1, facecolor=color, edgecolor='black'))
-        
-        # Set limits
-        ax.set_xlim(0, 3)
-        ax.set_ylim(0, 3)
-        
+        for i in range(n):
+            for j in range(n):
+                # The node colors of the diagram, gray for an unknown code
+                color = NODE_COLORS.get(get_color_name(int(face[i, j])), 'gray')
+                ax.add_patch(Rectangle((j, n - 1 - i), 1, 1, facecolor=color, edgecolor='black'))
+                if labels is not None:
+                    ax.text(j + 0.5, n - 0.5 - i, str(labels[face_idx][i, j]), ha='center', va='center',
+                            fontsize=12 * 3 / n, fontweight='bold')
+        ax.set_xlim(0, n)
+        ax.set_ylim(0, n)
         # Add face label
-        ax.text(1.5, -0.5, face_labels[face_idx], ha='center')
+        ax.text(n / 2, -0.5 * n / 3, FACE_LABELS_2D[face_idx], ha='center')
+    return axs
+
+def display_cube(cube, orientation_code=None, labels=None, title=None):
+    """
+    Display a 2D representation of the cube state.
     
+    Args:
+        cube (np.ndarray): The cube state, (6, n, n) color codes
+        orientation_code (str, optional): The orientation code used to initialize the cube
+        labels (np.ndarray, optional): (6, n, n) numbers to write on the stickers
+        title (str, optional): title above the net
+    """
+    # pyplot picks a GUI backend: only load it for the interactive views
+    import matplotlib.pyplot as plt
+
+    figure = plt.figure(figsize=(8, 6))
+    if title:
+        figure.suptitle(title)
+    # Add orientation info to title if provided
+    elif orientation_code:
+        up_color = get_color_name(int(orientation_code[0]))
+        front_color = get_color_name(int(orientation_code[1]))
+        figure.suptitle(f"Cube Orientation: {orientation_code} ({up_color} UP, {front_color} FRONT)")
+    draw_net(figure, np.asarray(cube), labels)
     plt.tight_layout()
     plt.show()
 
+@profiled('render')
+def save_net(cube, filename, labels=None, title=None):
+    """Write the 2D net of a cube (see draw_net) to an image file, without pyplot."""
+    figure = Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    if title:
+        figure.suptitle(title)
+    draw_net(figure, np.asarray(cube), labels)
+    figure.savefig(filename)
+    return filename
+
 def display_cube_state(cube, title=None, orientation_code=None):
     """Display the cube with an optional title and orientation code."""
-    if title:
-        plt.figure(figsize=(8, 6))
-        plt.suptitle(title)
-    
-    display_cube(cube, orientation_code)
-
-def get_color_name(color_index):
-    """Convert color index to its name."""
-    colors = {
-        0: "white",
-        1: "yellow",
-        2: "green",
-        3: "blue",
-        4: "orange",
-        5: "red"
-    }
-    return colors.get(color_index, "Unknown")
-
-def create_rubiks_diagram(points, colors, frame_number, subtext):
-    r = np.sqrt(3)/6  
-    centers = []
-        # Top center
-        # Bottom left
-        # Bottom right       
-    centers = [(0,2.5),(-2,-2*r),(2,-2*r)]
-    # Circle radii
-    circle_radii = [2.4, 2.8, 3.2]
-    face_colors = {
-    'orange': '#FFA500',  # Up (U)
-    'red': '#FF0000',     # Down (D)
-    'green': '#00FF00',   # Left (L)
-    'blue': '#0000FF',    # Right (R)
-    'white': '#FFFFFF',   # Front (F)
-    'yellow': '#FFFF00'   # Back (B)
-        }
-    
-    """Create the Rubik's Cube Venn diagram."""
-    plt.figure(figsize=(6.38, 6.38), dpi = 100)
-    ax = plt.subplot(111, aspect='equal')
-    # Draw concentric circles
-    for center in centers:
-        for radius in circle_radii:
-            circle = Circle(center, radius, fill=False, color='gray', linestyle='-', linewidth=1)
-            ax.add_patch(circle)
-
-    # Draw the intersection points as colored nodes
-    for point, color in zip(points, colors):
-        plt.plot(point[0], point[1], 'o', markersize=15, markerfacecolor=face_colors[color], markeredgecolor='black')
-
-    ax.text(-4., -5., subtext)
-    ax.text(0., -3.6, 'D')
-    ax.text(0., 2.3, 'U')
-    ax.text(-3.8, 2.3, 'L')
-    ax.text(3.6,2.3, 'B')
-    ax.text(-1.74, -0.60, 'F')
-    ax.text(1.54,-0.60, 'R')
-    plt.xlim(-5.5, 5.5)
-    plt.ylim(-5.5, 5.5)
-    plt.axis('off')
-    plt.title("Rubik's Cube Venn Representation", fontsize=14)
-    plt.tight_layout()
-    # Save the figure to a file instead of displaying it
-    filename = f'circle_frame_{frame_number:03d}.png'
-    plt.savefig(filename, dpi=100)
-    plt.show()
-    plt.close()  # Close the figure to free memory
+    display_cube(cube, orientation_code, title=title)
+
+class VennRenderer:
+    """
+    Persistent figure for the Rubik's Cube Venn diagram.
+
+    The figure, circles, labels and one scatter collection for the nodes are
+    built once; each frame only updates the node face colors and the subtext.
+    """
+
+    def __init__(self, points, figsize=(6.38, 6.38), dpi=100):
+        consts = framesetup.get_constants()
+        n = framesetup.cube_size(len(points))
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        ax = self.figure.add_subplot(111, aspect='equal')
+        # Draw concentric circles
+        for center in consts['centers']:
+            for radius in framesetup.get_ring_radii(n):
+                circle = Circle(center, radius, fill=False, color='gray', linestyle='-', linewidth=1)
+                ax.add_patch(circle)
+
+        # Draw the intersection points as colored nodes, on top of the circles
+        points = np.asarray(points)
+        self.rgba = to_rgba_array([NODE_COLORS[get_color_name(code)] for code in range(6)])
+        # Smaller nodes on the closer rings of bigger cubes
+        self.marker_size = NODE_MARKER_SIZE * node_scale(n)
+        self.edge_width = NODE_EDGE_WIDTH * node_scale(n)
+        self.nodes = ax.scatter(points[:, 0], points[:, 1], s=self.marker_size**2, marker='o',
+                                facecolors='white', edgecolors='black', linewidths=self.edge_width, zorder=2)
+
+        self.subtext = ax.text(*SUBTEXT_POSITION, '')
+        for label, x, y in FACE_LABELS:
+            ax.text(x, y, label)
+        ax.set_xlim(*LIMITS)
+        ax.set_ylim(*LIMITS)
+        ax.axis('off')
+        ax.set_title(TITLE, fontsize=14)
+        self.figure.tight_layout()
+        self.ax = ax
+        self.points = points
+        self.painter = None  # NodePainter of this figure, see get_node_painter
+        self.background = None  # (subtext, figure without the nodes), see render_moving
+        # Everything but the state and the subtext that shapes a frame, for the render cache
+        self.style = (RENDER_STYLE_VERSION, sorted(NODE_COLORS.items()), consts, points.tobytes(), figsize, dpi)
+
+    def update(self, colors, subtext):
+        """Set the node colors (uint8 state) and the subtext of the next frame."""
+        self.nodes.set_facecolors(self.rgba[np.asarray(colors)])
+        self.subtext.set_text(subtext)
+
+    @profiled('render')
+    def save(self, filename):
+        """Write the current frame to an image file."""
+        self.figure.savefig(filename, dpi=self.dpi)
+
+    @profiled('render')
+    def render_rgb(self, colors, subtext):
+        """Draw a frame on the Agg canvas and return it as an (h, w, 3) uint8 RGB array."""
+        self.update(colors, subtext)
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
+
+    @profiled('render')
+    def render_moving(self, positions, colors, subtext):
+        """
+        Draw a frame with the nodes at other positions than their own, as an RGB array.
 
+        Everything but the nodes is drawn once into a background, for each
+        subtext; a frame is a copy of it with only the scatter drawn over it.
+        The labels are clear of the nodes at rest, so a frame with the nodes
+        at their own positions is the same as a full draw.
+        """
+        if self.background is None or self.background[0] != subtext:
+            self.subtext.set_text(subtext)
+            self.nodes.set_visible(False)
+            self.canvas.draw()
+            self.nodes.set_visible(True)
+            self.background = (subtext, self.canvas.copy_from_bbox(self.figure.bbox))
+        self.nodes.set_facecolors(self.rgba[np.asarray(colors)])
+        self.nodes.set_offsets(positions)
+        self.canvas.restore_region(self.background[1])
+        self.ax.draw_artist(self.nodes)
+        # Back to the node positions, for the next full draw
+        self.nodes.set_offsets(self.points)
+        return np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
+
+    def cache_key(self, colors, subtext, label=''):
+        """Key of a frame in the render cache: state, orientation label, subtext, style and dpi."""
+        return RenderCache.key(np.asarray(colors, dtype=np.uint8), label, subtext, self.style)
+
+def render_frame(renderer, colors, subtext):
+    """renderer.render_rgb through the render cache."""
+    cache = get_render_cache()
+    if cache is None:
+        return renderer.render_rgb(colors, subtext)
+    key = renderer.cache_key(colors, subtext)
+    frame = cache.load_frame(key)
+    if frame is None:
+        frame = renderer.render_rgb(colors, subtext)
+        cache.store_frame(key, frame)
+    return frame
+
+class NodePainter:
+    """
+    Repaint single nodes of a rendered frame instead of redrawing the figure.
+
+    The nodes are split in two classes so that nodes whose markers touch are
+    never in the same class. Each of the 36 layers is the figure with every
+    class-0 node in one color and every class-1 node in another, kept only
+    around the nodes. A pixel near a node depends on at most one node of each
+    class, so its value in any state is read from the layer of those two
+    colors: a repainted frame is identical to a full redraw.
+    """
+
+    def __init__(self, renderer):
+        width, height = renderer.canvas.get_width_height()
+        # The equal aspect of the axes is applied at draw time
+        renderer.canvas.draw()
+        centers = renderer.ax.transData.transform(renderer.points)
+        centers[:, 1] = height - centers[:, 1]
+        # Marker radius and half the edge, in pixels, plus a margin for antialiased pixels
+        reach = (renderer.marker_size + renderer.edge_width) / 2 * renderer.dpi / 72 + 1
+        self.classes = _split_nodes(centers, 2 * reach)
+
+        pixels, owners = [], []
+        for node, (x, y) in enumerate(centers):
+            rows = np.arange(max(int(y - reach), 0), min(int(y + reach) + 2, height))
+            cols = np.arange(max(int(x - reach), 0), min(int(x + reach) + 2, width))
+            rows, cols = np.meshgrid(rows, cols, indexing='ij')
+            inside = (cols + 0.5 - x)**2 + (rows + 0.5 - y)**2 < reach**2
+            pixels.append(rows[inside] * width + cols[inside])
+            owners.append(np.full(inside.sum(), node))
+        owners = np.concatenate(owners)
+        self.pixels, index = np.unique(np.concatenate(pixels), return_inverse=True)
+        # Node of each class over every pixel; a pixel near one class only depends on that node
+        self.nodes = np.full((2, len(self.pixels)), -1)
+        self.nodes[self.classes[owners], index] = owners
+        self.nodes = np.where(self.nodes < 0, self.nodes[::-1], self.nodes)
+        # Pixels (indices into self.pixels) to repaint when a node changes
+        self.node_pixels = [np.flatnonzero((self.nodes == node).any(axis=0)) for node in range(len(centers))]
+        self.renderer = renderer
+        self.layers = None
+
+    def render_layers(self, jobs=1, size=None):
+        """
+        Draw the 36 two-class layers: (6, 6, pixels, 3) uint8.
+
+        With jobs > 1 they are drawn in a pool of that many processes, each
+        with its own figure of the given (width, height) frame size.
+        """
+        states = [np.where(self.classes == 0, first, second).astype(np.uint8)
+                  for first in range(6) for second in range(6)]
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker,
+                                     initargs=(self.renderer.points, tuple(size or FRAME_SIZE))) as pool:
+                frames = [frame.reshape(-1, 3)[self.pixels] for frame in pool.map(_render_worker_layer, states)]
+        else:
+            frames = [self.renderer.render_rgb(colors, '').reshape(-1, 3)[self.pixels] for colors in states]
+        return np.array(frames).reshape(6, 6, len(self.pixels), 3)
+
+    @profiled('render')
+    def paint(self, frame, colors, nodes):
+        """Repaint the given nodes of an (h, w, 3) frame, in place, with their color in colors."""
+        if len(nodes) == 0:
+            return frame
+        index = np.concatenate([self.node_pixels[node] for node in nodes])
+        codes = np.asarray(colors)[self.nodes[:, index]]
+        frame.reshape(-1, 3)[self.pixels[index]] = self.layers[codes[0], codes[1], index]
+        return frame
+
+def _split_nodes(centers, distance):
+    """
+    Two-color the nodes closer than distance to each other.
+
+    :return: class (0 or 1) of every node
+    :raises ValueError: when three or more markers overlap in a cycle of odd length
+    """
+    close = np.hypot(*(centers[:, None] - centers[None]).transpose(2, 0, 1)) < distance
+    np.fill_diagonal(close, False)
+    classes = np.full(len(centers), -1)
+    for start in range(len(centers)):
+        if classes[start] >= 0:
+            continue
+        classes[start] = 0
+        pending = [start]
+        while pending:
+            node = pending.pop()
+            for neighbor in np.flatnonzero(close[node]):
+                if classes[neighbor] < 0:
+                    classes[neighbor] = 1 - classes[node]
+                    pending.append(neighbor)
+                elif classes[neighbor] == classes[node]:
+                    raise ValueError('node markers overlap too much to split them in two classes')
+    return classes
+
+# Number of figure draws it takes to build the layers of a NodePainter
+NODE_LAYERS = 36
+
+def get_node_painter(renderer, build=True, jobs=1, size=None):
+    """
+    NodePainter of a renderer, with its layers from memory, the render cache
+    or, when build is set, drawn now (in `jobs` processes, see render_layers).
+
+    :return: the painter, None when the layers are not available or the
+             node layout does not allow repainting single nodes
+    """
+    if renderer.painter is None:
+        try:
+            renderer.painter = NodePainter(renderer)
+        except ValueError as error:
+            logger.info('full redraws: %s', error)
+            renderer.painter = False
+    painter = renderer.painter
+    if painter and painter.layers is None:
+        cache = get_render_cache()
+        key = RenderCache.key('node layers', renderer.style)
+        layers = cache.load_frame(key) if cache is not None else None
+        if layers is None and build:
+            layers = painter.render_layers(jobs, size)
+            if cache is not None:
+                cache.store_frame(key, layers)
+        painter.layers = layers
+    if painter and painter.layers is not None:
+        return painter
+    return None
+
+# Renderers shared between calls of create_rubiks_diagram, one per node layout and size
+_renderers = {}
+# Default frame size in pixels
+FRAME_SIZE = (638, 638)
+
+def get_figure_setup(size=FRAME_SIZE):
+    """Figure size and dpi giving a frame of size (width, height) pixels at the default scale."""
+    width, height = size
+    dpi = 100 * width / FRAME_SIZE[0]
+    return (FRAME_SIZE[0] / 100, FRAME_SIZE[0] / 100 * height / width), dpi
+
+def get_renderer(points, size=FRAME_SIZE):
+    """Return the persistent renderer for a set of points, creating it on first use."""
+    key = (np.asarray(points).tobytes(), tuple(size))
+    if key not in _renderers:
+        figsize, dpi = get_figure_setup(size)
+        _renderers[key] = VennRenderer(points, figsize=figsize, dpi=dpi)
+    return _renderers[key]
+
+def save_diagram(points, colors, filename, subtext, size=FRAME_SIZE, label=''):
+    """
+    Render a diagram with the shared renderer and save it to filename.
+
+    A diagram already rendered with the same state, label, subtext and style
+    is copied from the render cache instead of being drawn again.
+    """
+    renderer = get_renderer(points, size)
+    cache = get_render_cache()
+    if cache is not None:
+        key = renderer.cache_key(colors, subtext, label)
+        if cache.fetch(key, filename):
+            return filename
+    renderer.update(colors, subtext)
+    renderer.save(filename)
+    if cache is not None:
+        cache.store(key, filename)
     return filename
 
-def create_animation(fur, moves_list, twists , cleanfile= True):
-    subtext = 'turn'
-    fps = 1
-    # Create temporary directory for frames
-    frames = []
-    # Generate each frame
-    n = -1 
-    print('anim', fur)
-    cube, face_colors, corner = framesetup.initialize_cube(fur) 
-    initial_points, initial_colors = framesetup.generate_initial_points(corner)
-    filename = create_rubiks_diagram(initial_points, initial_colors,'', 'Initial solved state')
-    for x in moves_list:
-        n = n +1
-        k = moves_list.index(moves_list[n]) 
-
-        if n == 0 :
-                subtitle = 'Set #' + '  for algorithm x' #+ str(n)
-                filename = create_rubiks_diagram(initial_points, initial_colors,0, twists + '-')
-                frames.append(filename)  
-                points_after, colors_after = framesetup.perform_moves(
-                    initial_points, initial_colors, 
-                    [(moves_list[0])] , outergroups , centerpieces
-                    )
-                filename = create_rubiks_diagram(points_after, colors_after, 1, twists + '-')
-                frames.append(filename)  
-                print('frame ', n)
-        else :
-            points_after, colors_after  = framesetup.perform_moves(
-                                points_after, colors_after,
-                                [(moves_list[n])], outergroups , centerpieces
-                                )                   
-            filename = create_rubiks_diagram(points_after, colors_after, str(n+1), twists + '-')
-            frames.append(filename)  
-            print('frame ', n)
-            
-    fourcc = cv2.VideoWriter_fourcc(*'VP80')
-    video = cv2.VideoWriter('filename'+'.mp4', fourcc, float(fps), (638,638))
-    for frame in frames:
-        img_path = os.path.join(os.getcwd(), frame)
-        img = cv2.imread(img_path)
-        video.write(img)  
-           
-    # Optional: Clean up temporary files
-    if cleanfile:
-        for filename in frames:
-            os.remove(filename)
+def create_rubiks_diagram(points, colors, frame_number, subtext, label=''):
+    """Create the Rubik's Cube Venn diagram and save it as circle_frame_NNN.png."""
+    # Save the figure to a file instead of displaying it
+    if isinstance(frame_number, (int, np.integer)):
+        filename = f'circle_frame_{frame_number:03d}.png'
+    else:
+        filename = f'circle_frame_{frame_number}.png'
+    return save_diagram(points, colors, filename, subtext, label=label)
+
+def animation_states(initial_colors, moves_list, outergroups, centerpieces, points):
+    """Yield the cube state before the first move and after every move."""
+    colors = initial_colors
+    yield colors
+    for move in moves_list:
+        points, colors = framesetup.perform_moves(points, colors, [move], outergroups, centerpieces)
+        yield colors
+
+def animation_frames(renderer, states, subtext):
+    """Render each state straight to an RGB buffer, one frame at a time."""
+    for n, colors in enumerate(states):
+        logger.debug('frame %d', n)
+        yield render_frame(renderer, colors, subtext)
+
+def delta_animation_frames(renderer, painter, initial_colors, moves_list, subtext):
+    """
+    Render the first state in full, then repaint after each move only the
+    nodes it changes: the nodes the move permutation displaces, when their
+    color differs from before.
+    """
+    tables = framesetup.get_move_tables(renderer.points)
+    colors = np.asarray(initial_colors, dtype=np.uint8)
+    identity = np.arange(len(colors))
+    moved = {}
+    frame = render_frame(renderer, colors, subtext).copy()
+    logger.debug('frame %d', 0)
+    yield frame.copy()
+    for n, move in enumerate(moves_list, start=1):
+        perm = tables[move]
+        if move not in moved:
+            moved[move] = np.flatnonzero(perm != identity)
+        nodes = moved[move]
+        new_colors = colors[perm]
+        painter.paint(frame, new_colors, nodes[new_colors[nodes] != colors[nodes]])
+        colors = new_colors
+        logger.debug('frame %d', n)
+        yield frame.copy()
+
+def tween_animation_frames(renderer, initial_colors, moves_list, subtext, steps, ease=True):
+    """
+    Render the first state, then `steps` sub-frames per move, in which the
+    dots turn along their circle from their node before the move to their
+    node after it. All the sub-frame positions are computed up front by
+    tween_positions; each sub-frame is blitted by renderer.render_moving.
+    """
+    tables = framesetup.get_move_tables(renderer.points)
+    positions = tween_positions(renderer.points, moves_list, steps, ease)
+    colors = np.asarray(initial_colors, dtype=np.uint8)
+    logger.debug('frame %d', 0)
+    yield render_frame(renderer, colors, subtext)
+    for n, move in enumerate(moves_list):
+        # The dots of a move carry the colors of the state after it
+        colors = colors[tables[move]]
+        for step in range(steps):
+            logger.debug('frame %d', n * steps + step + 1)
+            yield renderer.render_moving(positions[n, step], colors, subtext)
+
+# Renderer of a pool worker process, built once by _init_render_worker
+_worker_renderer = None
+
+def _init_render_worker(points, size):
+    global _worker_renderer
+    figsize, dpi = get_figure_setup(size)
+    _worker_renderer = VennRenderer(points, figsize=figsize, dpi=dpi)
+
+def _render_worker_frame(job):
+    colors, subtext = job
+    return render_frame(_worker_renderer, colors, subtext)
+
+def _render_worker_layer(colors):
+    return _worker_renderer.render_rgb(colors, '')
+
+def parallel_animation_frames(points, states, subtext, jobs, size=FRAME_SIZE, chunksize=2):
+    """
+    Render states in a pool of `jobs` processes, each with its own persistent
+    figure, and yield the RGB frames in order.
+    """
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker,
+                             initargs=(np.asarray(points), tuple(size))) as pool:
+        frames = pool.map(_render_worker_frame, ((colors, subtext) for colors in states),
+                          chunksize=chunksize)
+        for n, frame in enumerate(frames):
+            logger.debug('frame %d', n)
+            yield frame
+
+@profiled('animation')
+def create_animation(fur, moves_list, twists , jobs=1,
+                     fmt='mp4', fps=1, size=FRAME_SIZE, codec=None, filename=None, tween=1, n=3,
+                     initial_colors=None):
+    """
+    Render the algorithm as a video, one frame per move.
+
+    Frames go from the Agg canvas to the video writer in memory, so no
+    intermediate PNG is written.
+    After the first frame only the nodes changed by each move are repainted
+    (see NodePainter), once the painter layers are in the render cache or
+    the animation is long enough to pay for drawing them; with jobs > 1
+    the 36 layers are drawn in a pool of that many processes. Otherwise,
+    with jobs > 1 the states of all frames are computed up front and the
+    frames are rendered in the pool.
+    With tween > 1 the moves are animated instead: each one takes `tween`
+    frames in which the dots turn along their circle, at a few milliseconds
+    per frame (see tween_animation_frames).
+
+    :param fmt: output format, one of video.VIDEO_FORMATS
+    :param fps: frames per second
+    :param size: (width, height) of the frames in pixels
+    :param codec: FOURCC overriding the default codec of an OpenCV format
+    :param filename: output file, by default derived from twists and fur
+    :param tween: frames per move; use with a higher fps, e.g. tween=15 at 30 fps
+    :param n: number of layers of the cube
+    :param initial_colors: state before the first move, default the solved cube of fur
+    :return: name of the written file
+    """
+    logger.debug('anim %s', fur)
+    cube, face_colors, corner = framesetup.initialize_cube(fur, n)
+    initial_points, solved_colors, outergroups, centerpieces = framesetup.generate_initial_points(corner, n)
+    if initial_colors is None:
+        initial_colors = solved_colors
+    renderer = get_renderer(initial_points, size)
+    painter = None
+    if tween <= 1:
+        painter = get_node_painter(renderer, build=len(moves_list) + 1 >= NODE_LAYERS, jobs=jobs, size=size)
+    states = animation_states(initial_colors, moves_list, outergroups, centerpieces, initial_points)
+    if tween > 1:
+        frames = tween_animation_frames(renderer, initial_colors, moves_list, twists + '-', tween)
+    elif painter is not None:
+        frames = delta_animation_frames(renderer, painter, initial_colors, moves_list, twists + '-')
+    elif jobs > 1:
+        frames = parallel_animation_frames(initial_points, list(states), twists + '-', jobs, size)
+    else:
+        frames = animation_frames(renderer, states, twists + '-')
+    if filename is None:
+        filename = video.output_filename(twists, fur, fmt)
+    return video.write_frames(frames, filename, fmt=fmt, fps=fps, codec=codec)
 
 # =====================================================================
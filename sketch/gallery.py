@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Batch illustration: render a whole catalog in one long-lived process
+# =====================================================================
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from structure import *
+from . import display, svg, video
+
+def entry_filename(entry, ext='png'):
+    """Output name of a manifest entry, like the examples: '<twists> <name> <fur>.png'."""
+    if entry['output']:
+        return entry['output']
+    name = ' '.join(part for part in (entry['twists'], entry['name'], entry['fur']) if part)
+    return f'{video.safe_filename(name)}.{ext}'
+
+def render_entry(entry, out_dir='.', animate=False, video_options=None, image_format='png'):
+    """
+    Render one manifest entry: the final diagram, or the animation when animate is set.
+
+    The diagram is a PNG, or a vector file when image_format is 'svg' or 'pdf'.
+
+    The geometry, the compiled algorithms and the renderer are shared by
+    every entry rendered in the same process.
+
+    :return: name of the written file, None when the entry is skipped
+    """
+    fur, twists = entry['fur'], entry['twists']
+    if fur not in CORNER_COLORS:
+        print(f'unknown corner: {fur}, skipping {entry}')
+        return None
+    try:
+        moves = parse_algorithm(twists, 3)
+    except ValueError as error:
+        print(f'invalid twists: {error}, skipping {entry}')
+        return None
+    video_options = dict(video_options or {})
+    if animate:
+        fmt = video_options.setdefault('fmt', 'mp4')
+        filename = os.path.join(out_dir, entry_filename(entry, video.VIDEO_EXTENSIONS[fmt]))
+        return display.create_animation(fur, moves, twists, filename=filename,
+                                        **video_options)
+
+    face_colors = get_face_colors(fur)
+    corner = [face_colors[5], face_colors[2], face_colors[0]]
+    points, colors, outergroups, centerpieces = framesetup.generate_initial_points(corner)
+    final_colors = colors[compile_algorithm(twists)]
+    filename = os.path.join(out_dir, entry_filename(entry, image_format))
+    if image_format in svg.VECTOR_FORMATS:
+        return svg.save_vector(points, final_colors, filename, entry['name'] or twists)
+    size = video_options.get('size', display.FRAME_SIZE)
+    return display.save_diagram(points, final_colors, filename, entry['name'] or twists, size, label=fur)
+
+def _render_job(job):
+    return render_entry(*job)
+
+def render_gallery(entries, out_dir='.', jobs=1, animate=False, video_options=None, image_format='png'):
+    """
+    Render every manifest entry, in this process or in a pool of `jobs` workers.
+
+    Each worker is a long-lived process rendering many entries, so the
+    imports, geometry and figure are set up once per worker, not per entry.
+
+    :return: list of written file names, in the order of the entries
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    work = [(entry, out_dir, animate, video_options, image_format) for entry in entries]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            filenames = list(pool.map(_render_job, work))
+    else:
+        filenames = [_render_job(job) for job in work]
+    for filename in filenames:
+        if filename:
+            print('wrote', filename)
+    return filenames
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Drawing style shared by the matplotlib and the vector renderers
+# =====================================================================
+
+__all__ = ['NODE_COLORS', 'NODE_MARKER_SIZE', 'NODE_EDGE_WIDTH', 'node_scale',
+           'RENDER_STYLE_VERSION', 'TITLE', 'FACE_LABELS', 'SUBTEXT_POSITION', 'LIMITS']
+
+# Node colors of the diagram, indexed by color name (see get_color_name)
+NODE_COLORS = {
+    'white': '#FFFFFF',
+    'yellow': '#FFFF00',
+    'green': '#00FF00',
+    'blue': '#0000FF',
+    'orange': '#FFA500',
+    'red': '#FF0000',
+    }
+# Node marker diameter and edge width, in points
+NODE_MARKER_SIZE = 15
+NODE_EDGE_WIDTH = 1.0
+
+def node_scale(n):
+    """Node size factor of an n x n x n cube: 1 up to 3x3, then as close as its rings."""
+    return min(1., 2 / (n - 1))
+
+# Bump when the drawing code changes, so that cached renders are not reused
+RENDER_STYLE_VERSION = 1
+
+TITLE = "Rubik's Cube Venn Representation"
+# Face labels and their position in diagram coordinates
+FACE_LABELS = (('D', 0., -3.6), ('U', 0., 2.3), ('L', -3.8, 2.3), ('B', 3.6, 2.3),
+               ('F', -1.74, -0.60), ('R', 1.54, -0.60))
+# Position of the subtext, and the visible square of the diagram
+SUBTEXT_POSITION = (-4., -5.)
+LIMITS = (-5.5, 5.5)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Vector output of the Venn diagram (SVG, PDF) without matplotlib
+# =====================================================================
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from structure.framesetup import cube_size, get_color_name, get_constants, get_ring_radii
+from structure.instrument import profiled
+from .style import *
+
+# Page layout in pixels (1 px = 0.75 pt in PDF), matching the PNG frames:
+# the diagram square and the node radius, in diagram units
+PAGE_SIZE = 638
+PLOT_BOX = (26.55, 38.1, 584.8)  # left, top, width of the LIMITS square
+NODE_RADIUS = 0.196
+FONT_SIZE = 13.9
+TITLE_SIZE = 19.4
+
+def _to_page(x, y):
+    """Diagram coordinates to page pixels, y pointing down."""
+    left, top, width = PLOT_BOX
+    scale = width / (LIMITS[1] - LIMITS[0])
+    return left + (np.asarray(x) - LIMITS[0]) * scale, top + (LIMITS[1] - np.asarray(y)) * scale
+
+def _scale():
+    return PLOT_BOX[2] / (LIMITS[1] - LIMITS[0])
+
+@lru_cache(maxsize=None)
+def _svg_background(n=3):
+    """The parts of the SVG that never change for an n x n x n cube: circles, labels and title."""
+    consts = get_constants()
+    lines = [f'<rect width="{PAGE_SIZE}" height="{PAGE_SIZE}" fill="white"/>',
+             '<g fill="none" stroke="gray" stroke-width="1">']
+    for center in consts['centers']:
+        cx, cy = _to_page(*center)
+        for radius in get_ring_radii(n):
+            lines.append(f'<circle cx="{cx:.2f}" cy="{cy:.2f}" r="{radius * _scale():.2f}"/>')
+    lines.append('</g>')
+    lines.append(f'<text x="{PAGE_SIZE / 2}" y="{PLOT_BOX[1] - 7:.2f}" font-size="{TITLE_SIZE}" '
+                 f'text-anchor="middle">{escape(TITLE)}</text>')
+    lines.append(f'<g font-size="{FONT_SIZE}">')
+    for label, x, y in FACE_LABELS:
+        px, py = _to_page(x, y)
+        lines.append(f'<text x="{px:.2f}" y="{py:.2f}">{label}</text>')
+    return '\n'.join(lines)
+
+@lru_cache(maxsize=8)
+def _svg_node_template(points_key):
+    """One circle per node with a %s for its color, for a given node layout."""
+    points = np.frombuffer(points_key).reshape(-1, 2)
+    px, py = _to_page(points[:, 0], points[:, 1])
+    radius = NODE_RADIUS * node_scale(cube_size(len(points))) * _scale()
+    return [f'<circle cx="{x:.2f}" cy="{y:.2f}" r="{radius:.2f}" fill="%s"/>' for x, y in zip(px, py)]
+
+def diagram_svg(points, colors, subtext=''):
+    """
+    The Venn diagram as SVG text.
+
+    :param points: node positions, as returned by generate_initial_points
+    :param colors: uint8 state, one color code per node
+    :param subtext: caption at the bottom left
+    """
+    template = _svg_node_template(np.ascontiguousarray(points, dtype=float).tobytes())
+    fills = [NODE_COLORS[get_color_name(code)] for code in range(6)]
+    nodes = '\n'.join(node % fills[code] for node, code in zip(template, np.asarray(colors).tolist()))
+    sx, sy = _to_page(*SUBTEXT_POSITION)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" width="{PAGE_SIZE}" height="{PAGE_SIZE}" '
+            f'viewBox="0 0 {PAGE_SIZE} {PAGE_SIZE}" font-family="sans-serif">\n'
+            f'{_svg_background(cube_size(len(template)))}\n'
+            f'<text x="{sx:.2f}" y="{sy:.2f}">{escape(subtext)}</text>\n</g>\n'
+            f'<g stroke="black" stroke-width="1.39">\n{nodes}\n</g>\n</svg>\n')
+
+@profiled('render')
+def save_svg(points, colors, filename, subtext=''):
+    """Write the diagram to an SVG file."""
+    with open(filename, 'w', encoding='utf-8') as target:
+        target.write(diagram_svg(points, colors, subtext))
+    return filename
+
+# Control point distance of the four Bezier curves approximating a circle
+_KAPPA = 0.5523
+
+def _pdf_circle(x, y, r):
+    """PDF path of a circle centered on (x, y), in points."""
+    k = r * _KAPPA
+    return (f'{x + r:.2f} {y:.2f} m '
+            f'{x + r:.2f} {y + k:.2f} {x + k:.2f} {y + r:.2f} {x:.2f} {y + r:.2f} c '
+            f'{x - k:.2f} {y + r:.2f} {x - r:.2f} {y + k:.2f} {x - r:.2f} {y:.2f} c '
+            f'{x - r:.2f} {y - k:.2f} {x - k:.2f} {y - r:.2f} {x:.2f} {y - r:.2f} c '
+            f'{x + k:.2f} {y - r:.2f} {x + r:.2f} {y - k:.2f} {x + r:.2f} {y:.2f} c')
+
+def _pdf_text(x, y, size, text, centered=False):
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    # Helvetica is about half an em wide per character, enough to center a title
+    if centered:
+        x -= 0.25 * size * len(text)
+    return f'BT /F1 {size:.2f} Tf {x:.2f} {y:.2f} Td ({text}) Tj ET'
+
+def diagram_pdf(points, colors, subtext=''):
+    """
+    The Venn diagram as a one-page PDF document (bytes).
+
+    Same layout as diagram_svg; circles are drawn as Bezier curves and the
+    text uses the standard Helvetica font, so the file embeds nothing.
+    """
+    consts = get_constants()
+    points = np.asarray(points)
+    n = cube_size(len(points))
+    page = PAGE_SIZE * 0.75
+    scale = 0.75
+
+    def to_pdf(x, y):
+        px, py = _to_page(x, y)
+        return px * scale, page - py * scale
+
+    commands = ['0.502 0.502 0.502 RG 0.75 w']
+    for center in consts['centers']:
+        cx, cy = to_pdf(*center)
+        for radius in get_ring_radii(n):
+            commands.append(_pdf_circle(cx, cy, radius * _scale() * scale) + ' S')
+    commands.append('0 0 0 RG 1.04 w')
+    rgb = [tuple(int(NODE_COLORS[get_color_name(code)][i:i + 2], 16) / 255 for i in (1, 3, 5))
+           for code in range(6)]
+    for (x, y), code in zip(points.tolist(), np.asarray(colors).tolist()):
+        px, py = to_pdf(x, y)
+        commands.append('%.3f %.3f %.3f rg ' % rgb[code] + _pdf_circle(px, py, NODE_RADIUS * node_scale(n) * _scale() * scale) + ' B')
+    commands.append('0 0 0 rg')
+    commands.append(_pdf_text(page / 2, page - (PLOT_BOX[1] - 7) * scale, TITLE_SIZE * scale, TITLE, True))
+    for label, x, y in FACE_LABELS + ((subtext, *SUBTEXT_POSITION),):
+        commands.append(_pdf_text(*to_pdf(x, y), FONT_SIZE * scale, label))
+    content = '\n'.join(commands).encode('latin-1', 'replace')
+
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+               b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+               (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page:.2f} {page:.2f}] '
+                f'/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>').encode(),
+               b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream',
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    document = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(document))
+        document += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(document)
+    document += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    document += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    document += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(document)
+
+@profiled('render')
+def save_pdf(points, colors, filename, subtext=''):
+    """Write the diagram to a PDF file."""
+    with open(filename, 'wb') as target:
+        target.write(diagram_pdf(points, colors, subtext))
+    return filename
+
+# Vector writers by file extension
+VECTOR_FORMATS = {'svg': save_svg, 'pdf': save_pdf}
+
+def save_vector(points, colors, filename, subtext=''):
+    """Write the diagram as SVG or PDF, after the extension of filename."""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension not in VECTOR_FORMATS:
+        raise ValueError(f'unknown vector format: {extension}')
+    return VECTOR_FORMATS[extension](points, colors, filename, subtext)
+
+def create_vector_diagram(points, colors, frame_number, subtext, fmt='svg'):
+    """Vector counterpart of display.create_rubiks_diagram: write circle_frame_NNN.svg (or .pdf)."""
+    if isinstance(frame_number, (int, np.integer)):
+        filename = f'circle_frame_{frame_number:03d}.{fmt}'
+    else:
+        filename = f'circle_frame_{frame_number}.{fmt}'
+    return save_vector(points, colors, filename, subtext)
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Streaming video output: frames are written as they are produced
+# =====================================================================
+import io
+import logging
+import os
+import struct
+import zlib
+from fractions import Fraction
+import numpy as np
+
+from structure.instrument import count, span
+
+logger = logging.getLogger(__name__)
+
+# Output formats: writer backend and default codec (FOURCC for OpenCV)
+VIDEO_FORMATS = {
+    'mp4': ('opencv', 'mp4v'),
+    'webm': ('opencv', 'VP80'),
+    'avi': ('opencv', 'MJPG'),
+    'gif': ('gif', None),
+    'apng': ('apng', None),
+    }
+# File extension of each format
+VIDEO_EXTENSIONS = {'mp4': 'mp4', 'webm': 'webm', 'avi': 'avi', 'gif': 'gif', 'apng': 'png'}
+
+def safe_filename(name):
+    """Replace the characters that are not allowed in file names on every platform."""
+    return ''.join('_' if char in '/\\:*?"<>|' else char for char in name)
+
+def output_filename(twists, fur, fmt='mp4'):
+    """Video file name derived from the algorithm and the orientation, e.g. 'RURi RWB.mp4'."""
+    name = f'{twists} {fur}'.strip() or 'solved'
+    return f'{safe_filename(name)}.{VIDEO_EXTENSIONS[fmt]}'
+
+def opencv_available():
+    """True when OpenCV can be imported."""
+    try:
+        import cv2
+    except ImportError:
+        return False
+    return True
+
+class OpenCVWriter:
+    """Video writer backed by cv2.VideoWriter, opened on the first frame."""
+
+    def __init__(self, filename, fps=1, codec='mp4v'):
+        import cv2
+        self.cv2 = cv2
+        self.filename = filename
+        self.fps = fps
+        self.codec = codec
+        self.video = None
+
+    def write(self, frame):
+        """Append an (h, w, 3) uint8 RGB frame."""
+        if self.video is None:
+            height, width = frame.shape[:2]
+            fourcc = self.cv2.VideoWriter_fourcc(*self.codec)
+            self.video = self.cv2.VideoWriter(self.filename, fourcc, float(self.fps), (width, height))
+            if not self.video.isOpened():
+                raise RuntimeError(f'OpenCV cannot write {self.filename} with codec {self.codec}')
+        # OpenCV expects BGR pixels
+        self.video.write(np.ascontiguousarray(frame[:, :, ::-1]))
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+
+class APNGWriter:
+    """
+    Pure-Python animated PNG writer.
+
+    Each frame is compressed with zlib and appended to the file right away;
+    the frame count in the header is patched when the writer is closed.
+    """
+
+    def __init__(self, filename, fps=1, codec=None):
+        self.filename = filename
+        delay = Fraction(1, 1) / Fraction(fps).limit_denominator(1000)
+        delay = delay.limit_denominator(65535)
+        self.delay = (delay.numerator, delay.denominator)
+        self.file = open(filename, 'wb')
+        self.size = None
+        self.frames = 0
+        self.sequence = 0
+        self.actl_offset = None
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def write(self, frame):
+        """Append an (h, w, 3) uint8 RGB frame."""
+        height, width = frame.shape[:2]
+        if self.size is None:
+            self.size = (width, height)
+            self.file.write(b'\x89PNG\r\n\x1a\n')
+            self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            self.actl_offset = self.file.tell()
+            self._chunk(b'acTL', struct.pack('>II', 0, 0))
+        elif self.size != (width, height):
+            raise ValueError(f'frame size {(width, height)} differs from {self.size}')
+
+        self._chunk(b'fcTL', struct.pack('>IIIIIHHBB', self.sequence, width, height, 0, 0,
+                                         self.delay[0], self.delay[1], 0, 0))
+        self.sequence += 1
+        # Filter type 0 (None) in front of every row
+        rows = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+        rows[:, 1:] = np.ascontiguousarray(frame[:, :, :3]).reshape(height, -1)
+        data = zlib.compress(rows.tobytes(), 6)
+        if self.frames == 0:
+            self._chunk(b'IDAT', data)
+        else:
+            self._chunk(b'fdAT', struct.pack('>I', self.sequence) + data)
+            self.sequence += 1
+        self.frames += 1
+
+    def close(self):
+        if self.size is not None:
+            self._chunk(b'IEND', b'')
+            # Patch the number of frames, now that it is known
+            self.file.seek(self.actl_offset)
+            self._chunk(b'acTL', struct.pack('>II', self.frames, 0))
+        self.file.close()
+
+def gif_palette():
+    """Fixed 256-color palette: the node colors, a gray ramp and the web-safe cube."""
+    colors = [(255, 255, 255), (255, 255, 0), (0, 255, 0), (0, 0, 255), (255, 165, 0), (255, 0, 0)]
+    colors += [(level, level, level) for level in np.linspace(0, 255, 34).astype(int)]
+    steps = range(0, 256, 51)
+    colors += [(r, g, b) for r in steps for g in steps for b in steps]
+    return np.array(colors[:256], dtype=np.uint8)
+
+class GIFWriter:
+    """
+    Animated GIF writer, streaming like APNGWriter.
+
+    Frames are reduced to a fixed palette as they arrive, so the colors do
+    not flicker between frames; Pillow (always installed with matplotlib)
+    LZW-encodes each one as a single-frame GIF, whose image block is
+    appended to the file right away. Only one frame is held in memory.
+    """
+
+    def __init__(self, filename, fps=1, codec=None):
+        from PIL import Image
+        self.Image = Image
+        self.filename = filename
+        # GIF delays are in hundredths of a second
+        self.delay = max(1, int(round(100 / fps)))
+        self.colors = gif_palette().tobytes()
+        palette = self.Image.new('P', (1, 1))
+        palette.putpalette(list(self.colors))
+        self.palette = palette
+        self.file = open(filename, 'wb')
+        self.size = None
+        self.frames = 0
+
+    def _image_block(self, image):
+        """Image descriptor and LZW data of a palette image, with a local color table when its palette is not ours."""
+        buffer = io.BytesIO()
+        image.save(buffer, 'GIF', optimize=False)
+        data = buffer.getvalue()
+        flags, position = data[10], 13
+        colors = b''
+        if flags & 0x80:
+            colors = data[position:position + 3 * 2 ** ((flags & 7) + 1)]
+            position += len(colors)
+        # Skip the extension blocks up to the image descriptor
+        while data[position] == 0x21:
+            position += 2
+            while data[position]:
+                position += data[position] + 1
+            position += 1
+        descriptor = bytearray(data[position:position + 10])
+        # Drop the trailer
+        block = data[position + 10:-1]
+        if not descriptor[9] & 0x80 and colors != self.colors:
+            descriptor[9] |= 0x80 | (flags & 7)
+            block = colors + block
+        return bytes(descriptor) + block
+
+    def write(self, frame):
+        """Append an (h, w, 3) uint8 RGB frame."""
+        height, width = frame.shape[:2]
+        if self.size is None:
+            self.size = (width, height)
+            # Header and logical screen with the 256 colors of the palette
+            self.file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0) + self.colors)
+            # Loop forever
+            self.file.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', 0) + b'\x00')
+        elif self.size != (width, height):
+            raise ValueError(f'frame size {(width, height)} differs from {self.size}')
+        image = self.Image.fromarray(np.ascontiguousarray(frame[:, :, :3]), 'RGB')
+        image = image.quantize(palette=self.palette, dither=self.Image.Dither.NONE)
+        # Graphic control extension: the delay of this frame
+        self.file.write(b'\x21\xf9\x04\x00' + struct.pack('<H', self.delay) + b'\x00\x00')
+        self.file.write(self._image_block(image))
+        self.frames += 1
+
+    def close(self):
+        if self.size is not None:
+            self.file.write(b'\x3b')
+        self.file.close()
+
+_WRITERS = {'opencv': OpenCVWriter, 'apng': APNGWriter, 'gif': GIFWriter}
+
+def open_writer(filename, fmt=None, fps=1, codec=None):
+    """
+    Open a streaming writer for a video format.
+
+    :param filename: output file name
+    :param fmt: one of VIDEO_FORMATS, guessed from the extension by default
+    :param fps: frames per second
+    :param codec: FOURCC for the OpenCV formats, default from VIDEO_FORMATS
+    :return: (writer, filename); when OpenCV is missing an OpenCV format
+             falls back to an APNG file next to the requested one
+    """
+    if fmt is None:
+        extension = os.path.splitext(filename)[1].lstrip('.').lower()
+        fmt = {'png': 'apng'}.get(extension, extension)
+    if fmt not in VIDEO_FORMATS:
+        raise ValueError(f'unknown video format: {fmt}')
+    backend, default_codec = VIDEO_FORMATS[fmt]
+    if backend == 'opencv' and not opencv_available():
+        logger.warning('OpenCV is not installed, writing an animated PNG instead of %s', fmt)
+        backend = 'apng'
+        filename = os.path.splitext(filename)[0] + '.png'
+    writer = _WRITERS[backend](filename, fps=fps, codec=codec or default_codec)
+    return writer, writer.filename
+
+def write_frames(frames, filename, fmt=None, fps=1, codec=None):
+    """Stream RGB frames to a video file as they are produced; return the file name."""
+    writer, filename = open_writer(filename, fmt=fmt, fps=fps, codec=codec)
+    try:
+        for frame in frames:
+            with span('write frame', 'encode'):
+                writer.write(frame)
+            count('frames written')
+    finally:
+        writer.close()
+    return filename
@@ -10,4 +10,17 @@ from moves import *
 from execute-move_sequence import *
 from illustrator import *
 '''
-from framesetup import *
+from .instrument import *
+from .framesetup import *
+from .state import *
+from .batch import *
+from .parse_algorithm import *
+from .catalog import *
+from .cubies import *
+from .solver import *
+from .analysis import *
+from .symmetry import *
+from .scramble import *
+from .facelets import *
+from .views import *
+from .tween import *
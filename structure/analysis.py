@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Permutation algebra on algorithms: order, cycles, commutators
+# =====================================================================
+import numpy as np
+
+from .cubies import CORNERS, EDGES, FACE_NAMES, get_cubie_facelets
+from .framesetup import get_geometry
+from .parse_algorithm import compile_algorithm
+
+__all__ = ['inverse_permutation', 'is_identity', 'permutation_power', 'commutator', 'conjugate',
+           'permutation_cycles', 'batch_orders', 'permutation_order', 'piece_cycles',
+           'format_cycles', 'analyze_algorithm', 'analyze_catalog']
+
+def inverse_permutation(perm):
+    """Permutation undoing perm: colors[perm][inverse] == colors."""
+    return np.argsort(perm)
+
+def is_identity(perm):
+    """True when the permutation leaves every node in place."""
+    return bool(np.array_equal(perm, np.arange(len(perm))))
+
+def permutation_power(perm, exponent):
+    """perm applied exponent times (negative for the inverse), by repeated squaring."""
+    perm = np.asarray(perm)
+    if exponent < 0:
+        perm, exponent = inverse_permutation(perm), -exponent
+    result = np.arange(len(perm))
+    while exponent:
+        if exponent & 1:
+            result = result[perm]
+        perm = perm[perm]
+        exponent >>= 1
+    return result
+
+def commutator(a, b):
+    """Permutation of the commutator A B A' B' of two algorithm permutations."""
+    return a[b][inverse_permutation(a)][inverse_permutation(b)]
+
+def conjugate(a, b):
+    """Permutation of the conjugate A B A' of two algorithm permutations."""
+    return a[b][inverse_permutation(a)]
+
+def permutation_cycles(perm):
+    """
+    Disjoint cycles of a node permutation, without the fixed nodes.
+
+    Each cycle starts at its smallest node and follows the stickers:
+    the sticker of node cycle[k] moves to node cycle[k + 1].
+    """
+    destination = inverse_permutation(perm).tolist()
+    seen = [False] * len(destination)
+    cycles = []
+    for start in range(len(destination)):
+        if seen[start] or destination[start] == start:
+            continue
+        cycle = []
+        node = start
+        while not seen[node]:
+            seen[node] = True
+            cycle.append(node)
+            node = destination[node]
+        cycles.append(tuple(cycle))
+    return cycles
+
+def batch_orders(perms):
+    """
+    Order of every permutation of an (n, nodes) array, in one vectorized pass.
+
+    The cycle length of each node is the first power that brings it back;
+    the order is the lcm of the cycle lengths.
+    """
+    perms = np.atleast_2d(perms)
+    identity = np.arange(perms.shape[1])
+    lengths = np.zeros(perms.shape, dtype=np.int64)
+    power = perms
+    for step in range(1, perms.shape[1] + 1):
+        lengths[(power == identity) & (lengths == 0)] = step
+        if lengths.all():
+            break
+        power = np.take_along_axis(power, perms, axis=1)
+    return np.lcm.reduce(lengths, axis=1)
+
+def permutation_order(perm):
+    """How many times an algorithm must be repeated to bring the cube back."""
+    return int(batch_orders(perm)[0])
+
+def piece_cycles(perm, facelets=None):
+    """
+    Cycles of the corners, edges and centers moved by a node permutation.
+
+    :return: dict with 'corners', 'edges' and 'centers', each a list of
+             (slot names, orientation) tuples; the orientation is the twist
+             (0-2) or flip (0-1) a piece has gained after one trip around its cycle
+    """
+    if facelets is None:
+        facelets = get_cubie_facelets()
+    faces = get_geometry()['faces']
+    destination = inverse_permutation(perm)
+    result = {}
+    for kind, nodes, names in (('corners', facelets['corners'], CORNERS),
+                               ('edges', facelets['edges'], EDGES),
+                               ('centers', facelets['centers'][:, None],
+                                [FACE_NAMES[faces[node]] for node in facelets['centers']])):
+        slot_of = np.full(len(perm), -1)
+        position_of = np.full(len(perm), -1)
+        slot_of[nodes] = np.arange(len(nodes))[:, None]
+        position_of[nodes] = np.arange(nodes.shape[1])
+        # Where the reference sticker of each slot goes, and at which position
+        moved = destination[nodes[:, 0]]
+        target, offset = slot_of[moved].tolist(), position_of[moved].tolist()
+        seen = [False] * len(nodes)
+        cycles = []
+        for start in range(len(nodes)):
+            if seen[start] or (target[start] == start and offset[start] == 0):
+                continue
+            cycle, twist, slot = [], 0, start
+            while not seen[slot]:
+                seen[slot] = True
+                cycle.append(names[slot])
+                twist += offset[slot]
+                slot = target[slot]
+            cycles.append((tuple(cycle), twist % nodes.shape[1]))
+        result[kind] = cycles
+    return result
+
+def format_cycles(cycles):
+    """Cycle notation of piece_cycles, e.g. '(URF UFL ULB) (UR UF)+ (DF)'; + and - mark the twists and flips."""
+    marks = {0: '', 1: '+', 2: '-'}
+    return ' '.join(f"({' '.join(names)}){marks[orientation]}"
+                    for kind in ('corners', 'edges', 'centers') for names, orientation in cycles[kind])
+
+def analyze_algorithm(twists):
+    """
+    Order and cycle structure of an algorithm, by permutation algebra.
+
+    :param twists: algorithm in the notation of parse_algorithm
+    :return: dict with 'order', 'cycles' (see piece_cycles) and 'notation'
+    """
+    perm = compile_algorithm(twists)
+    cycles = piece_cycles(perm)
+    return {'order': permutation_order(perm), 'cycles': cycles, 'notation': format_cycles(cycles)}
+
+def analyze_catalog(entries):
+    """
+    Analyze every entry of an algorithm table or manifest at once.
+
+    :param entries: dicts with 'twists' (and 'name'), e.g. from read_algorithm_table()
+    :return: one dict per entry with 'name', 'twists', 'order', 'cycles' and 'notation';
+             an entry whose twists cannot be parsed has an 'error' message instead
+             of 'order', 'cycles' and 'notation' (None)
+    """
+    results, perms = [], []
+    for entry in entries:
+        result = {'name': entry.get('name', ''), 'twists': entry['twists'],
+                  'order': None, 'cycles': None, 'notation': None}
+        try:
+            perms.append(compile_algorithm(entry['twists']))
+        except ValueError as error:
+            result['error'] = str(error)
+        results.append(result)
+    valid = [result for result in results if 'error' not in result]
+    orders = batch_orders(np.array(perms)).tolist() if perms else []
+    for result, perm, order in zip(valid, perms, orders):
+        cycles = piece_cycles(perm)
+        result.update(order=order, cycles=cycles, notation=format_cycles(cycles))
+    return results
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Batched move application over many cube states at once
+# =====================================================================
+import numpy as np
+
+from .framesetup import CORNER_COLORS, cube_size, get_cube_tables, get_face_colors
+from .state import STATE_DTYPE, as_state
+
+__all__ = ['recolor_states', 'apply_moves_batch']
+
+def recolor_states(reference_state, reference_fur, orientations=CORNER_COLORS):
+    """
+    Build the solved state of several corner orientations from one reference.
+
+    Every node keeps its face, so an orientation only changes which color
+    code each face carries: one lookup row per orientation recolors the
+    reference in a single fancy-index operation.
+
+    :param reference_state: solved state returned by generate_initial_points,
+                            or any sequence accepted by as_state
+    :param reference_fur: orientation code the reference was built with
+    :param orientations: orientation codes, default all 24 of CORNER_COLORS
+    :return: (N, 54) uint8 state matrix, rows in the order of orientations
+    """
+    reference_state = as_state(reference_state)
+    reference_faces = get_face_colors(reference_fur)
+    luts = np.zeros((len(orientations), 6), dtype=STATE_DTYPE)
+    for row, fur in enumerate(orientations):
+        luts[row, reference_faces] = get_face_colors(fur)
+    return np.take_along_axis(
+        luts, np.broadcast_to(reference_state, (len(orientations), reference_state.shape[-1])), axis=1)
+
+def apply_moves_batch(states, moves, tables=None):
+    """
+    Apply the same move sequence to every row of a state matrix.
+
+    :param states: (N, 54) uint8 state matrix (a single state is accepted too)
+    :param moves: list of (face, direction) tuples as returned by Rubiks()
+    :param tables: move permutation tables from framesetup.get_move_tables,
+                   default those of the cube size of the states
+    :return: new (N, 54) state matrix; the input is left untouched
+    """
+    states = np.atleast_2d(as_state(states))
+    if tables is None:
+        tables = get_cube_tables(cube_size(states.shape[-1]))
+    if not moves:
+        return states.copy()
+    # Ping-pong between two buffers: one gather per move, no allocation
+    current = np.empty_like(states)
+    spare = np.empty_like(states)
+    np.take(states, tables[moves[0]], axis=1, out=current)
+    for move in moves[1:]:
+        np.take(current, tables[move], axis=1, out=spare)
+        current, spare = spare, current
+    return current
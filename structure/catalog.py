@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Algorithm catalogs and batch manifests
+# =====================================================================
+import csv
+import json
+import os
+
+__all__ = ['ALGORITHMS_TABLE', 'read_algorithm_table', 'read_manifest']
+
+# Default location of the algorithm table shipped with the project
+ALGORITHMS_TABLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'doc', 'algorithms')
+
+def read_algorithm_table(path=ALGORITHMS_TABLE):
+    """
+    Read the markdown table of doc/algorithms.
+
+    Section titles and empty rows (no moves) are skipped, and the spaces
+    between the moves are removed so the algorithm reads like a -t argument.
+
+    :return: list of dicts with 'name' and 'twists'
+    """
+    entries = []
+    with open(path, encoding='utf-8') as table:
+        for line in table:
+            cells = [cell.strip() for cell in line.strip().strip('|').split('|')]
+            if len(cells) < 2 or not cells[1] or set(cells[1]) <= set('-: '):
+                continue
+            name, moves = cells[0], cells[1]
+            if moves == 'Moves':  # header row
+                continue
+            entries.append({'name': ' '.join(name.split()), 'twists': ''.join(moves.split())})
+    return entries
+
+def _manifest_entry(record, default_fur):
+    """Normalize a manifest record: accepted keys are fur/orientation, twists/algorithm, name, output."""
+    return {
+        'fur': record.get('fur') or record.get('orientation') or default_fur,
+        'twists': ''.join((record.get('twists') or record.get('algorithm') or '').split()),
+        'name': record.get('name') or '',
+        'output': record.get('output') or None,
+        }
+
+def read_manifest(path, default_fur='RWB'):
+    """
+    Read a batch manifest.
+
+    A .jsonl file holds one JSON object per line and a .csv file has a
+    header row; both use the keys fur (or orientation), twists (or
+    algorithm), name and output. Any other file is read as an algorithm
+    table like doc/algorithms, every entry in the default_fur orientation.
+
+    :return: list of dicts with 'fur', 'twists', 'name' and 'output'
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.jsonl':
+        with open(path, encoding='utf-8') as manifest:
+            records = [json.loads(line) for line in manifest if line.strip()]
+    elif extension == '.csv':
+        with open(path, encoding='utf-8', newline='') as manifest:
+            records = list(csv.DictReader(manifest))
+    else:
+        records = read_algorithm_table(path)
+    return [_manifest_entry(record, default_fur) for record in records]
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Cubie model: corners and edges read off the Venn nodes
+# =====================================================================
+import numpy as np
+
+from .framesetup import get_geometry, get_move_tables
+
+__all__ = ['FACE_NAMES', 'CORNERS', 'EDGES', 'build_cubie_facelets', 'get_cubie_facelets',
+           'state_to_cubies', 'cubies_to_state', 'perm_to_cubies']
+
+FACE_NAMES = 'UDFBLR'
+# Corner and edge slots in the usual solver order; slice edges come last
+CORNERS = ('URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB')
+EDGES = ('UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR')
+
+# Facelet tables, derived once from the move tables by get_cubie_facelets()
+_cubie_facelets = None
+
+def _reference_face(faces):
+    """Face of a cubie that defines its orientation: U/D, else F/B (slice edges)."""
+    for reference in ('UD', 'FB'):
+        for face in faces:
+            if face in reference:
+                return face
+
+def build_cubie_facelets(tables=None, faces=None):
+    """
+    Find the nodes of every corner and edge slot from the face move tables.
+
+    A node belongs to the cubie made of the faces whose moves displace it,
+    and sits on the face given by the geometry. The first node of a slot is
+    on its reference face (U/D, or F/B for the slice edges); the corner nodes
+    are then ordered so that every face move keeps their cyclic order, as on
+    the physical cubie.
+
+    :return: dict with 'corners' (8, 3) and 'edges' (12, 2) node indices in
+             slot order, and 'centers' (6,) the center node of every face
+    """
+    if tables is None:
+        tables = get_move_tables()
+    if faces is None:
+        faces = get_geometry()['faces']
+    n_nodes = len(faces)
+    movers = [set() for _ in range(n_nodes)]
+    for face in FACE_NAMES:
+        perm = tables[(face, 'cw')]
+        for node in np.nonzero(perm != np.arange(n_nodes))[0]:
+            movers[node].add(face)
+    nodes_of = {}
+    for node, moved_by in enumerate(movers):
+        nodes_of.setdefault(frozenset(moved_by), []).append(node)
+
+    def slot_nodes(name):
+        nodes = nodes_of.get(frozenset(name))
+        if nodes is None or len(nodes) != len(name):
+            raise ValueError(f'the move tables have no {name} cubie')
+        reference = _reference_face(name)
+        return sorted(nodes, key=lambda node: FACE_NAMES[faces[node]] != reference)
+
+    edges = np.array([slot_nodes(name) for name in EDGES], dtype=np.intp)
+    centers = np.array([nodes_of[frozenset()][[faces[node] for node in nodes_of[frozenset()]].index(face)]
+                        for face in range(6)], dtype=np.intp)
+
+    # Corners: fix the order of URF, then carry it to the other slots with
+    # quarter turns; a twist then never depends on the path taken
+    slot_of = {}
+    for slot, name in enumerate(CORNERS):
+        for node in slot_nodes(name):
+            slot_of[node] = slot
+    corners = {0: sorted(slot_nodes(CORNERS[0]), key=lambda node: CORNERS[0].index(FACE_NAMES[faces[node]]))}
+    # destination[node]: where a quarter turn sends the sticker of that node
+    destinations = [np.argsort(tables[(face, 'cw')]) for face in FACE_NAMES]
+    pending = [0]
+    while pending:
+        source = pending.pop()
+        for destination in destinations:
+            order = [int(destination[node]) for node in corners[source]]
+            target = slot_of[order[0]]
+            if target in corners:
+                continue
+            # Rotate so that the reference node comes first
+            first = order.index(slot_nodes(CORNERS[target])[0])
+            corners[target] = order[first:] + order[:first]
+            pending.append(target)
+    corners = np.array([corners[slot] for slot in range(len(CORNERS))], dtype=np.intp)
+    return {'corners': corners, 'edges': edges, 'centers': centers}
+
+def get_cubie_facelets():
+    """Return the facelet tables of build_cubie_facelets, built on first use."""
+    global _cubie_facelets
+    if _cubie_facelets is None:
+        _cubie_facelets = build_cubie_facelets()
+    return _cubie_facelets
+
+def _piece_lookup(names):
+    """Map the sorted face codes of every piece to its index."""
+    return {tuple(sorted(FACE_NAMES.index(face) for face in name)): index
+            for index, name in enumerate(names)}
+
+_CORNER_LOOKUP = _piece_lookup(CORNERS)
+_EDGE_LOOKUP = _piece_lookup(EDGES)
+
+def state_to_cubies(state, facelets=None):
+    """
+    Read the cubies of a state, relative to its center colors.
+
+    Slot i holds cubie cp[i] with orientation co[i]: the position, in the
+    slot, of the cubie's reference sticker. Likewise for the edges.
+
+    :param state: uint8 color codes, one per node
+    :return: (cp, co, ep, eo) lists
+    :raises ValueError: when the stickers do not form valid cubies
+    """
+    if facelets is None:
+        facelets = get_cubie_facelets()
+    state = np.asarray(state)
+    center_colors = state[facelets['centers']].tolist()
+    if sorted(center_colors) != list(range(6)):
+        raise ValueError(f'the centers do not have six different colors: {center_colors}')
+    face_of_color = np.argsort(center_colors)
+    result = []
+    for nodes, lookup in ((facelets['corners'], _CORNER_LOOKUP), (facelets['edges'], _EDGE_LOOKUP)):
+        stickers = face_of_color[state[nodes]].tolist()
+        perm, orientation = [], []
+        for slot, faces in enumerate(stickers):
+            piece = lookup.get(tuple(sorted(faces)))
+            if piece is None:
+                raise ValueError(f'no cubie has the faces {[FACE_NAMES[face] for face in faces]}')
+            reference = FACE_NAMES.index(_reference_face([FACE_NAMES[face] for face in faces]))
+            perm.append(piece)
+            orientation.append(faces.index(reference))
+        result += [perm, orientation]
+    return tuple(result)
+
+def cubies_to_state(cp, co, ep, eo, center_colors, facelets=None):
+    """
+    Color the nodes of a cubie description, the inverse of state_to_cubies.
+
+    The cubie arrays may have leading dimensions, e.g. (count, 8) corner
+    permutations for count states at once.
+
+    :param center_colors: color code of each face in face order, e.g. get_face_colors(fur)
+    :return: uint8 state, or (count, nodes) states
+    """
+    if facelets is None:
+        facelets = get_cubie_facelets()
+    faces = get_geometry()['faces']
+    center_colors = np.asarray(center_colors, dtype=np.uint8)
+    cp = np.asarray(cp)
+    state = np.broadcast_to(center_colors[faces], cp.shape[:-1] + faces.shape).copy()
+    for nodes, perm, orientation, modulo in ((facelets['corners'], cp, co, 3),
+                                             (facelets['edges'], ep, eo, 2)):
+        # Stickers of the solved cubie, turned by its orientation
+        solved = nodes[np.asarray(perm)]
+        shift = (np.arange(modulo) - np.asarray(orientation)[..., None]) % modulo
+        state[..., nodes] = center_colors[faces[np.take_along_axis(solved, shift, axis=-1)]]
+    return state
+
+def perm_to_cubies(perm, facelets=None):
+    """Cubie description (cp, co, ep, eo) of a node permutation, e.g. of a move."""
+    faces = get_geometry()['faces']
+    return state_to_cubies(faces[np.asarray(perm)], facelets)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Facelet strings (URFDLB) and face arrays to and from Venn states
+# =====================================================================
+from functools import lru_cache
+
+import numpy as np
+
+from .framesetup import (cube_size, get_face_colors, get_geometry, get_ring_radii,
+                         sticker_positions)
+
+__all__ = ['FACELET_FACES', 'CUBE_FACES', 'get_facelet_nodes', 'facelets_to_state',
+           'faces_to_state', 'state_to_faces', 'state_to_facelets']
+
+# Face order of the facelet strings, as in the usual solver format
+FACELET_FACES = 'URFDLB'
+# Face order of initialize_cube and of the diagram: U, D, F, B, L, R
+CUBE_FACES = 'UDFBLR'
+
+@lru_cache(maxsize=None)
+def get_facelet_nodes(n=3):
+    """
+    Node of every facelet of an n x n x n facelet string, precomputed once per size.
+
+    The string lists the faces in URFDLB order, each row by row as seen on
+    the unfolded cube: U with B at the top, R, F and L with U at the top,
+    D with F at the top, and B with U at the top and R on the left.
+
+    :return: read-only (6 n^2,) index array: state[nodes] lists the colors in facelet order
+    """
+    positions = sticker_positions(get_geometry(get_ring_radii(n)))
+    node_at = {tuple(position): node for node, position in enumerate(positions.tolist())}
+    # Row and column coordinates, growing down and right; coordinates are (U, F, R)
+    row, col = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    down, right = (2 * row - (n - 1)).ravel(), (2 * col - (n - 1)).ravel()
+    side = np.full(n * n, n)
+    faces = {'U': (side, down, right), 'R': (-down, -right, side), 'F': (-down, side, right),
+             'D': (-side, -down, right), 'L': (-down, right, -side), 'B': (-down, -side, -right)}
+    nodes = np.array([node_at[position] for face in FACELET_FACES
+                      for position in zip(*(coordinate.tolist() for coordinate in faces[face]))], dtype=np.intp)
+    nodes.setflags(write=False)
+    return nodes
+
+def facelets_to_state(facelets, fur='RWB'):
+    """
+    Venn state of a cube given facelet by facelet, e.g. as scanned: one
+    table lookup, no solving.
+
+    :param facelets: string of 6 n^2 face letters in URFDLB order (see
+                     get_facelet_nodes), spaces ignored; or a (6, n, n) array
+                     of color codes with the faces in initialize_cube's order
+                     (U, D, F, B, L, R), each laid out as in the string
+    :param fur: corner orientation giving the color of every face letter
+    :return: uint8 state, on the nodes of generate_initial_points(corner, n)
+    :raises ValueError: when the size or the letters are not those of a cube
+    """
+    if isinstance(facelets, str):
+        letters = ''.join(facelets.split()).upper()
+        n = int(round(np.sqrt(len(letters) / 6)))
+        if 6 * n * n != len(letters) or n < 2:
+            raise ValueError(f'{len(letters)} facelets are not the stickers of a cube')
+        unknown = set(letters) - set(FACELET_FACES)
+        if unknown:
+            raise ValueError(f"unknown face letters {''.join(sorted(unknown))}, expected {FACELET_FACES}")
+        face_colors = np.asarray(get_face_colors(fur), dtype=np.uint8)
+        colors = face_colors[[CUBE_FACES.index(letter) for letter in letters]]
+    else:
+        faces = np.asarray(facelets)
+        if faces.ndim != 3 or faces.shape[0] != 6 or faces.shape[1] != faces.shape[2]:
+            raise ValueError(f'expected a (6, n, n) array of faces, not {faces.shape}')
+        if faces.min() < 0 or faces.max() > 5:
+            raise ValueError('color codes go from 0 to 5')
+        return faces_to_state(faces.astype(np.uint8))
+    state = np.empty(len(colors), dtype=np.uint8)
+    state[get_facelet_nodes(n)] = colors
+    return state
+
+def faces_to_state(faces):
+    """
+    Values of a (6, n, n) face array on the Venn nodes, whatever they are:
+    colors, sticker numbers... The faces are in initialize_cube's order
+    (U, D, F, B, L, R), each laid out as in the facelet strings.
+    """
+    faces = np.asarray(faces)
+    n = faces.shape[1]
+    state = np.empty(6 * n * n, dtype=faces.dtype)
+    state[get_facelet_nodes(n)] = faces[[CUBE_FACES.index(face) for face in FACELET_FACES]].reshape(-1)
+    return state
+
+def state_to_faces(state):
+    """(6, n, n) face array of the values on the Venn nodes, the inverse of faces_to_state."""
+    state = np.asarray(state)
+    n = cube_size(len(state))
+    faces = state[get_facelet_nodes(n)].reshape(6, n, n)
+    return faces[[FACELET_FACES.index(face) for face in CUBE_FACES]]
+
+def state_to_facelets(state, fur=None):
+    """
+    Facelet string of a state, in URFDLB order with face letters, the
+    inverse of facelets_to_state.
+
+    :param fur: corner orientation naming the face of every color; by
+                default the color of a face is that of its center, which
+                even cubes do not have
+    :raises ValueError: when the centers do not have six different colors
+    """
+    state = np.asarray(state)
+    n = cube_size(len(state))
+    colors = state[get_facelet_nodes(n)]
+    if fur is not None:
+        centers = np.asarray(get_face_colors(fur))[[CUBE_FACES.index(face) for face in FACELET_FACES]]
+    elif n % 2:
+        centers = colors.reshape(6, n * n)[:, n * n // 2]
+    else:
+        raise ValueError(f'a {n}x{n}x{n} cube has no centers to name its faces, give its orientation')
+    if len(set(centers.tolist())) != 6:
+        raise ValueError(f'the centers do not have six different colors: {centers.tolist()}')
+    face_of_color = np.empty(6, dtype=np.intp)
+    face_of_color[centers] = np.arange(6)
+    return ''.join(np.array(list(FACELET_FACES))[face_of_color[colors]])
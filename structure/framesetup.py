@@ -1,10 +1,54 @@
 # -*- coding: utf-8 -*-
 #!/usr/bin/env python
 # =====================================================================
+import logging
+import os
 import sys
+from functools import lru_cache
 import numpy as np
 
-def initialize_cube(orientation_code):
+from .instrument import end_span, profiled, start_span
+
+__all__ = ['CORNER_COLORS', 'initialize_cube', 'get_face_colors', 'get_color_center',
+           'get_opposite_color', 'get_face_name', 'get_color_name', 'get_circle_intersections',
+           'get_constants', 'get_ring_radii', 'cube_size', 'GEOMETRY_CACHE_ENV', 'CIRCLE_PAIRS',
+           'build_geometry', 'save_geometry', 'load_geometry', 'get_geometry', 'get_initial_state',
+           'generate_initial_points', 'MOVE_AXES', 'CW_SIGNS', 'get_move_center', 'trace_move',
+           'build_move_tables', 'sticker_positions', 'build_layer_tables', 'move_layers',
+           'compose_layers', 'MoveTables', 'get_cube_tables', 'get_move_tables', 'compose_moves',
+           'perform_moves', 'detect_layer_corners', 'rotate_face', 'rotate_facelet']
+
+logger = logging.getLogger(__name__)
+
+# The 24 corner orientations accepted by initialize_cube, colors in FUR order
+CORNER_COLORS = [
+    'BOY',
+    'BRW',
+    'BWO',
+    'BYR',
+    'GOW',
+    'GRY',
+    'GWR',
+    'GYO',
+    'OBW',
+    'OGY',
+    'OWG',
+    'OYB',
+    'RBY',
+    'RGW',
+    'RWB',
+    'RYG',
+    'WBR',
+    'WGO',
+    'WOB',
+    'WRG',
+    'YBO',
+    'YGR',
+    'YOG',
+    'YRB',
+     ]
+
+def initialize_cube(orientation_code, n=3):
     """
     Initialize a 3D numpy array representing a Rubik's cube with optional orientation.
     
@@ -18,7 +62,7 @@ def initialize_cube(orientation_code):
         
     Cube representation:
     - 6 faces (0=Up, 1=Down, 2=Front, 3=Back, 4=Left, 5=Right)
-    - Each face is 3x3
+    - Each face is n x n (3x3 by default)
     - Colors are represented by integers 0-5
     """
         # Create a solved cube where each face has a unique color/number
@@ -33,56 +77,23 @@ def initialize_cube(orientation_code):
     'yellow': '#FFFF00'   # Back (B)
     }
 
-    corner_colors= [
-        'BOY',
-        'BRW',
-        'BWO',
-        'BYR',
-        'GOW',
-        'GRY',
-        'GWR',
-        'GYO',
-        'OBW',
-        'OGY',
-        'OWG',
-        'OYB',
-        'RBY',
-        'RGW',
-        'RWB',
-        'RYG',
-        'WBR',
-        'WGO',
-        'WOB',
-        'WRG',
-        'YBO',
-        'YGR',
-        'YOG',
-        'YRB',
-         ]
     fur= orientation_code
     
-    if fur in corner_colors: 
-        front_color = get_color_center(fur[0])
-        up_color = get_color_center(fur[1])
-        right_color = get_color_center(fur[2])
-        
-        down_color = get_opposite_color(up_color)
-        left_color = get_opposite_color(right_color)
-        back_color = get_opposite_color(front_color)
-        print (f"UP: {get_color_name(up_color)}; RIGHT: {get_color_name(right_color)}; FRONT: {get_color_name(front_color)}")
-        print (f"DOWN: {get_color_name(down_color)}; BACK: {get_color_name(back_color)}; LEFT: {get_color_name(left_color)}")
+    if fur in CORNER_COLORS: 
+        face_colors = get_face_colors(fur)
+        up_color, down_color, front_color, back_color, left_color, right_color = face_colors
+        logger.info("UP: %s; RIGHT: %s; FRONT: %s", get_color_name(up_color), get_color_name(right_color),
+                    get_color_name(front_color))
+        logger.info("DOWN: %s; BACK: %s; LEFT: %s", get_color_name(down_color), get_color_name(back_color),
+                    get_color_name(left_color))
 
     else: 
         print(f'unknown corner: {fur}')
         sys.exit()
 
     # Create a solved cube where each face has a unique color/number
-    cube = np.zeros((6, 3, 3), dtype=int)
+    cube = np.zeros((6, n, n), dtype=int)
     
-        # Assign colors to faces
-    face_colors = [up_color, down_color, front_color,
-                   back_color, left_color, right_color]
-
     for i in range(6):
         cube[i, :, :] = face_colors[i]
 
@@ -90,6 +101,20 @@ def initialize_cube(orientation_code):
 
     return cube, face_colors, corner
 
+def get_face_colors(orientation_code):
+    """
+    Color code of each face for a corner orientation.
+
+    :param orientation_code: one of CORNER_COLORS, e.g. 'RWB'
+    :return: list of color codes in face order [Up, Down, Front, Back, Left, Right]
+    """
+    front_color = get_color_center(orientation_code[0])
+    up_color = get_color_center(orientation_code[1])
+    right_color = get_color_center(orientation_code[2])
+    return [up_color, get_opposite_color(up_color),
+            front_color, get_opposite_color(front_color),
+            get_opposite_color(right_color), right_color]
+
 def get_color_center(face_color):
     colors_digit =  {
          "W" :0, # "white",
@@ -168,215 +193,449 @@ def get_constants():
         'circle_radii': circle_radii,
         }
     return constants
+
+def get_ring_radii(n=3):
+    """
+    Radii of the concentric rings of an n x n x n cube: n rings spread
+    evenly over the span of the 3x3 ones, which are kept as they are.
+    """
+    if n < 2:
+        raise ValueError(f'a cube has at least 2 layers, not {n}')
+    circle_radii = get_constants()['circle_radii']
+    if n == len(circle_radii):
+        return list(circle_radii)
+    return np.linspace(circle_radii[0], circle_radii[-1], n).tolist()
+
+def cube_size(node_count):
+    """Number of layers n of the cube whose diagram has node_count (6 n^2) nodes."""
+    n = int(round(np.sqrt(node_count / 6)))
+    if 6 * n * n != node_count:
+        raise ValueError(f'{node_count} nodes are not the stickers of a cube')
+    return n
   
-def generate_initial_points(corner):
+# Geometries of the diagram, computed once per set of radii by get_geometry()
+_geometries = {}
+# Environment variable naming an optional .npz file persisting the geometry
+GEOMETRY_CACHE_ENV = 'RUBIKS_GEOMETRY_CACHE'
+# Circle pairs (i < j) in the order the nodes are numbered
+CIRCLE_PAIRS = [(0, 1), (0, 2), (1, 2)]
+
+@profiled('geometry')
+def build_geometry(circle_radii=None):
+    """
+    Compute the intersection points of the diagram and the face of each one.
+
+    Every pair of circles of the three centers x N radii is intersected in a
+    single broadcast, then duplicates are merged on a fine grid. Nodes are
+    numbered pair by pair, then by the ring index on each circle.
+    The geometry depends only on the constants, not on the cube colors.
+
+    :param circle_radii: radii of the concentric rings, default from get_constants()
+    :return: dict with 'points' (n, 2) array, 'faces' (n,) face index of every
+             node, 'rings' (n, 3) ring index of the node on each circle (-1 when
+             it is not on that circle), and per face 'centerpieces' and 'outergroups'
+    """
+    consts = get_constants()
+    centers = np.array(consts['centers'], dtype=float)
+    if circle_radii is None:
+        circle_radii = consts['circle_radii']
+    radii = np.asarray(circle_radii, dtype=float)
+    n_rings = len(radii)
+    pairs = np.array(CIRCLE_PAIRS)
+
+    # Shapes (pair, ring on first circle, ring on second circle)
+    center1 = centers[pairs[:, 0]].T[:, :, None, None]
+    center2 = centers[pairs[:, 1]].T[:, :, None, None]
+    crossings = get_circle_intersections(center1, center2, radii[None, :, None], radii[None, None, :])
+    # -> (pair, ring1, ring2, crossing, xy), flattened in the same order
+    points = np.stack([np.stack(crossing, axis=-1) for crossing in crossings], axis=-2)
+    shape = points.shape[:-1]
+    pair_idx, ring1, ring2, _ = np.indices(shape)
+    points = points.reshape(-1, 2)
+    pair_idx, ring1, ring2 = pair_idx.ravel(), ring1.ravel(), ring2.ravel()
+
+    # Drop circles that do not meet, then merge coincident crossings,
+    # keeping the first occurrence of each point
+    keep = np.nonzero(np.isfinite(points).all(axis=1))[0]
+    _, first = np.unique(np.round(points[keep], 6), axis=0, return_index=True)
+    keep = keep[np.sort(first)]
+    points, pair_idx, ring1, ring2 = points[keep], pair_idx[keep], ring1[keep], ring2[keep]
+
+    # Face of each node: each pair of circles meets in two lens-shaped clusters
+    x, y = points[:, 0], points[:, 1]
+    faces = np.select([pair_idx == 2, pair_idx == 0],
+                      [np.where(y > 0, 0, 1), np.where(x > 0, 5, 4)],
+                      np.where(x < 0, 2, 3)).astype(np.uint8)
+
+    rings = np.full((len(points), 3), -1, dtype=np.int8)
+    rows = np.arange(len(points))
+    rings[rows, pairs[pair_idx, 0]] = ring1
+    rings[rows, pairs[pair_idx, 1]] = ring2
+
+    centerpieces = {}
+    outergroups = {}
+    middle = (n_rings - 1) // 2
+    for face in range(6):
+        face_indices = np.nonzero(faces == face)[0]
+        center = (ring1[face_indices] == middle) & (ring2[face_indices] == middle)
+        if n_rings % 2:
+            # The two middle rings cross at the center of the face
+            center_x, center_y = points[face_indices[center][0]]
+            face_indices = face_indices[~center]
+        else:
+            center_x, center_y = points[face_indices].mean(axis=0)
+        centerpieces[face] = [[center_x, center_y]]
+        # Sort the other points around the face center and split them in quarters
+        angles = np.arctan2(points[face_indices, 1] - center_y, points[face_indices, 0] - center_x)
+        sorted_indices = face_indices[np.argsort(angles)].tolist()
+        quarter = len(sorted_indices) // 4
+        outergroups[face] = [sorted_indices[k:k + quarter] for k in range(0, 4 * quarter, quarter)]
+
+    for array in (points, faces, rings):
+        array.setflags(write=False)
+    return {'points': points, 'faces': faces, 'rings': rings,
+            'centerpieces': centerpieces, 'outergroups': outergroups}
+
+def save_geometry(geometry, cache_file, circle_radii=None):
+    """Persist the geometry to a .npz file, along with the constants it came from."""
+    consts = get_constants()
+    if circle_radii is None:
+        circle_radii = consts['circle_radii']
+    np.savez(cache_file,
+             points=geometry['points'], faces=geometry['faces'], rings=geometry['rings'],
+             centerpieces=np.array([geometry['centerpieces'][face][0] for face in range(6)]),
+             outergroups=np.array([geometry['outergroups'][face] for face in range(6)]),
+             centers=np.array(consts['centers']), circle_radii=np.array(circle_radii))
+
+def load_geometry(cache_file, circle_radii=None):
+    """Load a geometry saved by save_geometry, None if it is stale or unreadable."""
+    consts = get_constants()
+    if circle_radii is None:
+        circle_radii = consts['circle_radii']
+    try:
+        with np.load(cache_file) as data:
+            if (data['centers'].shape != np.shape(consts['centers'])
+                    or data['circle_radii'].shape != np.shape(circle_radii)
+                    or not np.allclose(data['centers'], consts['centers'])
+                    or not np.allclose(data['circle_radii'], circle_radii)):
+                return None
+            geometry = {key: data[key] for key in ('points', 'faces', 'rings')}
+            geometry['centerpieces'] = {face: [data['centerpieces'][face].tolist()] for face in range(6)}
+            geometry['outergroups'] = {face: data['outergroups'][face].tolist() for face in range(6)}
+    except (OSError, KeyError, ValueError):
+        return None
+    for key in ('points', 'faces', 'rings'):
+        geometry[key].setflags(write=False)
+    return geometry
+
+def get_geometry(circle_radii=None, cache_file=None):
+    """
+    Return the diagram geometry, computed once per process and set of radii.
+
+    :param circle_radii: radii of the concentric rings, default from get_constants()
+    :param cache_file: optional .npz file to load the geometry from, or to
+                       save it to when missing; defaults to the file named by
+                       the RUBIKS_GEOMETRY_CACHE environment variable. The
+                       ring count is added to the name: geometry.npz stands
+                       for geometry-n3.npz, geometry-n4.npz...
+    """
+    if circle_radii is None:
+        circle_radii = get_constants()['circle_radii']
+    key = tuple(float(radius) for radius in circle_radii)
+    if key not in _geometries:
+        geometry = None
+        cache_file = cache_file or os.environ.get(GEOMETRY_CACHE_ENV)
+        if cache_file:
+            # One file per ring count, so that cubes of several sizes do not
+            # overwrite each other; np.savez would add the suffix anyway
+            stem = cache_file[:-len('.npz')] if cache_file.endswith('.npz') else cache_file
+            cache_file = f'{stem}-n{len(key)}.npz'
+        if cache_file and os.path.exists(cache_file):
+            geometry = load_geometry(cache_file, circle_radii)
+        if geometry is None:
+            geometry = build_geometry(circle_radii)
+            if cache_file:
+                save_geometry(geometry, cache_file, circle_radii)
+        _geometries[key] = geometry
+    return _geometries[key]
+
+@lru_cache(maxsize=None)
+def get_initial_state(corner, n=3):
+    """
+    Solved state of a corner orientation, memoized per orientation and size.
+
+    :param corner: tuple of the Right, Front and Up color codes
+    :param n: number of layers of the cube
+    :return: read-only uint8 array of color codes, one per node
+    """
+    right_color, front_color, up_color = corner
+    face_colors = [up_color, get_opposite_color(up_color),
+                   front_color, get_opposite_color(front_color),
+                   get_opposite_color(right_color), right_color]
+    state = np.array(face_colors, dtype=np.uint8)[get_geometry(get_ring_radii(n))['faces']]
+    state.setflags(write=False)
+    return state
+
+def generate_initial_points(corner, n=3):
+    """Return the intersection points and the solved colors of a corner orientation of an n x n x n cube."""
+    geometry = get_geometry(get_ring_radii(n))
+    # Colors are kept as a uint8 state array of color codes (see state.py)
+    colors = get_initial_state(tuple(int(color) for color in corner), n).copy()
+    return geometry['points'], colors, geometry['outergroups'], geometry['centerpieces']
+
+# Axis of every face, middle slice and whole cube move: the circle it turns,
+# 0 the top one (U/D), 1 the bottom left one (F/B), 2 the bottom right one (L/R)
+MOVE_AXES = {'U': 0, 'E': 0, 'D': 0, 'y': 0,
+             'F': 1, 'S': 1, 'B': 1, 'z': 1,
+             'R': 2, 'M': 2, 'L': 2, 'x': 2}
+# Sense of a 'cw' turn about each axis, in the sticker coordinates of sticker_positions
+CW_SIGNS = (1, -1, 1)
+
+def get_move_center(face_code):
+    """Center of the circle a face, slice or whole cube move turns around."""
+    # U and D share the top circle, F and B the bottom left one, L and R the
+    # bottom right one; a middle slice turns the circle sharing its axis
+    return get_constants()['centers'][MOVE_AXES[face_code]]
+
+# Permutation tables per cube size, filled in once by get_cube_tables()
+_move_tables = {}
+
+def trace_move(points, centerpieces, face_code, direction):
+    """
+    Work out where every node goes for a single move.
+
+    The geometric detection (rotate_face / detect_layer_corners / rotate_facelet)
+    is run once on the node indices themselves instead of on colors, so the
+    result is an index array `perm` such that colors_after = colors_before[perm].
+    """
     consts = get_constants()
-    centers = consts['centers']
     circle_radii= consts['circle_radii']
-    """Generate initial intersection points and colors."""
-    intersections = []
-    colors = []
-    Xpoints= []
-    Xcenter= []    
-    # Find intersections and colors
-    for i, center1 in enumerate(centers):
-        for j, center2 in enumerate(centers):
-            if i < j:  # Avoid duplicate pairs
-                for r1_idx, radius1 in enumerate(circle_radii):
-                    for r2_idx, radius2 in enumerate(circle_radii):
-                        # Find intersections between circles from different sets
-                        points = get_circle_intersections(center1, center2, radius1, radius2)
-
-                        for point in points:
-                            # Check if point is already in the list (within a small tolerance)
-                            is_duplicate = False
-                            for existing_point in intersections:
-                                if np.sqrt((point[0] - existing_point[0])**2 + (point[1] - existing_point[1])**2) < 0.1:
-                                    is_duplicate = True
-                                    break
-
-                            if not is_duplicate:
-                                intersections.append(point)
-
-                                # Calculate distance from diagram center
-                                center_x, center_y = 0, 0.1 
-                                distance = np.sqrt((point[0] - center_x)**2 + (point[1] - center_y)**2)
-
-                                # Color assignment logic
-                                
-                                if (i,j)   == (0,1): b = corner[0]
-                                elif (i,j) == (0,2): b = corner[1]
-                                elif (i,j) == (1,2): b = corner[2]
-    
-                                if (distance < 1.912 ):
-                                    color = get_color_name(b)
-                                    colors.append(color)
-                                else:
-                                    # Outer regions - opposite colors of visible faces
-                 
-                                    c =get_opposite_color(b)
-                                    color = get_color_name(c)
-                                    colors.append(color)                                                     
-                                if (i,j) == (1,2)  : 
-                                    
-                                    if point[1]> 0:
-                                        row = (0,point[0], point[1])
-                                        if (r1_idx,r2_idx) != (1,1) : Xpoints.append(row)
-                                        else: Xcenter.append(row) 
-                                    elif point[1] < 0: 
-                                        row = (1,point[0], point[1])
-                                        if (r1_idx,r2_idx) != (1,1) : Xpoints.append(row)
-                                        else: Xcenter.append(row) 
-                                        
-                                if (i,j) == (0,1)  : 
-                                    
-                                    if point[0] > 0:
-                                        row = (5,point[0], point[1])
-                                        if (r1_idx,r2_idx) != (1,1) : Xpoints.append(row)
-                                        else: Xcenter.append(row) 
-                                    elif point[0] < 0: 
-                                        row = (4,point[0], point[1])
-                                        if (r1_idx,r2_idx) != (1,1) : Xpoints.append(row)
-                                        else: Xcenter.append(row)                                         
-    
-                                if (i,j) == (0,2)  : 
-                                    
-                                    if point[0] < 0:
-                                        row = (2,point[0], point[1])
-                                        if (r1_idx,r2_idx) != (1,1) : Xpoints.append(row)
-                                        else: Xcenter.append(row) 
-                                    elif point[0] > 0: 
-                                        row = (3,point[0], point[1])
-                                        if (r1_idx,r2_idx) != (1,1) : Xpoints.append(row)
-                                        else: Xcenter.append(row)                                         
-    faceouter = {0: [], 1: [], 2: [], 3: [] , 4: [], 5: []}
-
-    for idx, item in enumerate(Xpoints):
-        face = item[0]
-        x_coord = item[1]
-        y_coord = item[2]
-        faceouter[face].append([x_coord, y_coord])
-         
-        
-    centerpieces = {0: [], 1: [], 2: [], 3: [] , 4: [], 5: []}
-    for idx, item in enumerate(Xcenter):
-        face = item[0]
-        x_coord = item[1]
-        y_coord = item[2]
-        centerpieces[face].append([x_coord, y_coord])
-        
-    outergroups = {0: [], 1: [], 2: [], 3: [] , 4: [], 5: []}
-    for face in faceouter:
-        face_indices = []
-        if face == 0: 
-            print('center UP', centerpieces[face][0][0], centerpieces[face][0][1] )
-            print('outer', len(faceouter[face]), faceouter[face])  
+
+    # Map face codes to indices and radius indices
+    face_map = {'U': 0, 'D': 1, 'F': 2, 'B': 3, 'L': 4, 'R': 5,
+                'M': 'M', 'S': 'S', 'E': 'E'}
     
-        for i, point in enumerate(intersections):
-            if i in faceouter[face]:
-                continue
-            sep = np.sqrt((point[0] - centerpieces[face][0][0])**2 + (point[1] - centerpieces[face][0][1])**2)
-            if 0.001 < sep < 0.7 :
-                face_indices.append(i)
-                
-        # Calculate the angle of each point relative to the  center
-        point_angles = [(i, np.arctan2((intersections[i][1] - centerpieces[0][0][1]), (intersections[i][0]-centerpieces[0][0][0]))) for i in face_indices]     
-            # Sort points by angle to get them in order around the circle
-        point_angles.sort(key=lambda x: x[1])
-        sorted_indices_with_angles = [(idx, angle) for idx, angle in point_angles]
-        #print('moving points', len(point_angles), point_angles)
-        point_angles.sort(key=lambda x: x[1])
-        #print('moving points', len(point_angles))
-        
-        sorted_indices_with_angles = [(idx, angle) for idx, angle in point_angles]
+    # Map faces to their appropriate radius index (0=inner, 2=outer)
+    radius_map = {'U': 0, 'D': 2, 'F': 0, 'B': 2, 'L': 2, 'R': 0}
+
+    labels = np.arange(len(points))
+
+    if face_code in 'UDFBLR':  # Regular face moves
+        face = face_map[face_code]
+        radius_idx = radius_map[face_code]
         
-        # Group into 4 sets of 3 points with their angles
-        groups_with_angles = [sorted_indices_with_angles[i:i+2] for i in range(0, 8, 2)]
+        # Rotate the face edges
+        points, labels = rotate_face(
+            points, labels, direction, 
+            center=get_move_center(face_code), radius=circle_radii[radius_idx]
+        )
         
-        # For each group, sort by angle again (may not be necessary if already sorted)
+        # Detect corner pieces for this specific layer
+        corner_groups = detect_layer_corners(
+            points, centerpieces[face], 
+            circle_radii[radius_idx], face_code
+        )
         
-        for group in groups_with_angles:
-            # Sort each group by angle
-            group.sort(key=lambda x: x[1])
-            # Extract just the indices
-            sorted_group = [idx for idx, angle in group]
-            outergroups[face].append(sorted_group)        
+        # Rotate the corners
+        if corner_groups:
+            points, labels = rotate_facelet(
+                points, labels, corner_groups, direction, face_code
+            )
         
-    return intersections, colors , outergroups, centerpieces
+    else:  # Middle slice moves
+        points, labels = rotate_face(
+            points, labels, direction, 
+            center=get_move_center(face_code), radius=circle_radii[1]
+        )
 
-def perform_moves(points, colors, moves , outergroups):
+    return np.asarray(labels, dtype=np.intp)
+
+@profiled('geometry')
+def build_move_tables(points, centerpieces):
+    """
+    Build the permutation table of every move in both directions.
+
+    :return: dict mapping (face, direction) to an index array, e.g. ('R', 'cw')
+    """
+    tables = {}
+    for face_code in 'UDFBLRMES':
+        for direction in ('cw', 'ccw'):
+            perm = trace_move(points, centerpieces, face_code, direction)
+            perm.setflags(write=False)
+            tables[(face_code, direction)] = perm
+    return tables
+
+def sticker_positions(geometry):
+    """
+    3D position of the sticker at every node, as integer coordinates.
+
+    Ring k of a circle is layer k of its axis, counted from the U, F or R
+    side: the coordinate along that axis is n-1-2k, and n (or -n) on the
+    face the sticker belongs to. The axes are ordered as in MOVE_AXES.
+
+    :return: (nodes, 3) int array
+    """
+    rings = np.asarray(geometry['rings'], dtype=int)
+    n = cube_size(len(rings))
+    positions = n - 1 - 2 * rings
+    # Axis and side of the faces U, D, F, B, L, R
+    face_axes = np.array([0, 0, 1, 1, 2, 2])
+    face_sides = np.array([1, -1, 1, -1, -1, 1])
+    faces = np.asarray(geometry['faces'])
+    positions[np.arange(len(rings)), face_axes[faces]] = face_sides[faces] * n
+    return positions
+
+@profiled('geometry')
+def build_layer_tables(geometry):
+    """
+    Permutation of every single layer turn of an n x n x n cube.
+
+    A turn is the quarter rotation of the sticker positions of its layer
+    (see sticker_positions): every node of the layer gets the color of the
+    node its position comes from.
+
+    :return: dict mapping (axis, layer, direction) to an index array
+    """
+    positions = sticker_positions(geometry)
+    n = cube_size(len(positions))
+    # Node at every position, through a flat index of the (2n+1)^3 grid
+    span = 2 * n + 1
+    flat = lambda xyz: ((xyz[..., 0] + n) * span + xyz[..., 1] + n) * span + xyz[..., 2] + n
+    node_at = np.full(span ** 3, -1, dtype=np.intp)
+    node_at[flat(positions)] = np.arange(len(positions))
+
+    tables = {}
+    for axis in range(3):
+        first, second = [other for other in range(3) if other != axis]
+        for layer in range(n):
+            coordinate = n - 1 - 2 * layer
+            turned = positions[:, axis] == coordinate
+            if layer == 0:
+                turned |= positions[:, axis] == n
+            if layer == n - 1:
+                turned |= positions[:, axis] == -n
+            nodes = np.flatnonzero(turned)
+            for direction, sign in (('cw', CW_SIGNS[axis]), ('ccw', -CW_SIGNS[axis])):
+                source = positions[nodes].copy()
+                source[:, first] = -sign * positions[nodes, second]
+                source[:, second] = sign * positions[nodes, first]
+                perm = np.arange(len(positions))
+                perm[nodes] = node_at[flat(source)]
+                perm.setflags(write=False)
+                tables[(axis, layer, direction)] = perm
+    return tables
+
+def move_layers(face_code, n, depths=(1,)):
+    """
+    Layers turned by a move of an n x n x n cube.
+
+    :param face_code: face (UDFBLR), middle slice (MES) or whole cube (xyz) letter
+    :param depths: layers counted from the face, 1 being the face itself;
+                   ignored by slices and whole cube moves
+    :return: list of layer indices along MOVE_AXES[face_code]
+    """
+    if face_code in 'xyz':
+        return list(range(n))
+    if face_code in 'MES':
+        if n % 2 == 0 or tuple(depths) != (1,):
+            raise ValueError(f'no middle slice {face_code} on a {n}x{n}x{n} cube')
+        return [(n - 1) // 2]
+    if not all(1 <= depth <= n for depth in depths):
+        raise ValueError(f'{face_code} layers {depths} out of a {n}x{n}x{n} cube')
+    if face_code in 'UFR':
+        return [depth - 1 for depth in depths]
+    return [n - depth for depth in depths]
+
+def compose_layers(layers, n, face_code, direction, depths=(1,)):
+    """Permutation of a move of an n x n x n cube, from the layer turns of build_layer_tables."""
+    axis = MOVE_AXES[face_code]
+    perm = np.arange(6 * n * n)
+    # Layers of one axis commute, so their order does not matter
+    for layer in move_layers(face_code, n, depths):
+        perm = perm[layers[(axis, layer, direction)]]
+    perm.setflags(write=False)
+    return perm
+
+class MoveTables(dict):
+    """
+    Move permutations of an n x n x n cube, keyed like the moves of parse_algorithm.
+
+    The face and middle slice moves are built up front. Inner slice and wide
+    moves, keyed (face, direction, depths), and whole cube rotations are
+    composed from the layer turns on first use and kept.
+    """
+
+    def __init__(self, n, layers, moves):
+        super().__init__(moves)
+        self.n = n
+        self.layers = layers
+
+    def __missing__(self, move):
+        if move[0] not in MOVE_AXES:
+            raise KeyError(move)
+        perm = compose_layers(self.layers, self.n, *move)
+        self[move] = perm
+        return perm
+
+def get_cube_tables(n=3):
+    """
+    Return the move tables of an n x n x n cube, building them on first use.
+
+    The 3x3 face and slice moves are traced on the diagram (build_move_tables);
+    they are the same as the layer turns, which every other size uses.
+    """
+    if n not in _move_tables:
+        geometry = get_geometry(get_ring_radii(n))
+        layers = build_layer_tables(geometry)
+        if n == 3:
+            moves = build_move_tables(geometry['points'], geometry['centerpieces'])
+        else:
+            moves = {(face_code, direction): compose_layers(layers, n, face_code, direction)
+                     for face_code in 'UDFBLR' + ('MES' if n % 2 else '')
+                     for direction in ('cw', 'ccw')}
+        _move_tables[n] = MoveTables(n, layers, moves)
+    return _move_tables[n]
+
+def get_move_tables(points=None, centerpieces=None):
+    """Return the move tables of the cube whose diagram has these points (3x3 by default)."""
+    return get_cube_tables(3 if points is None else cube_size(len(points)))
+
+def compose_moves(moves, tables=None):
+    """
+    Fuse a move sequence into a single permutation.
+
+    :param moves: list of (face, direction) or (face, direction, depths) tuples
+    :return: index array perm with colors_after = colors_before[perm]
+    """
+    if tables is None:
+        tables = get_move_tables()
+    perm = np.arange(len(next(iter(tables.values()))))
+    for move in moves:
+        perm = perm[tables[move]]
+    return perm
+
+def perform_moves(points, colors, moves , outergroups, centerpieces):
     """
     Perform a sequence of moves starting from the given state.    
     :param points: List of intersection points
-    :param colors: List of colors for the points
+    :param colors: Cube state, a uint8 array of color codes
     :param moves: List of tuples (face, direction) 
                   where face is 'U' for up, 'R' for right, 'F' for front
                   and direction is 'cw' or 'ccw'
+    :param outergroups: Point groups around each face (kept for compatibility)
+    :param centerpieces: Center point of each face
     :return: Tuple of final points and colors
     """
-    consts = get_constants()
-    centers = consts['centers']
-    circle_radii= consts['circle_radii']
-    current_points = points.copy()
-    current_colors = colors.copy()
-    # Circle center positions
-    circle_centers = {
-        0: centers[0],  # U face center
-        1: centers[0],  # D face center (same x,y as U but different radius)
-        2: centers[1],  # F face center
-        3: centers[1],  # B face center (same x,y as F but different radius)
-        4: centers[2],  # L face center
-        5: centers[2],  # R face center (same x,y as L but different radius)
-        }
+    started = start_span()
+    tables = get_move_tables(points, centerpieces)
+    current_colors = np.asarray(colors, dtype=np.uint8)
+
+    # Each move is a single gather on the color array
+    for move in moves:
+        current_colors = current_colors[tables[move]]
+    end_span(started, 'perform_moves', 'move', 'moves', len(moves))
     
-    # Map face codes to indices and radius indices
-    face_map = {'U': 0, 'D': 1, 'F': 2, 'B': 3, 'L': 4, 'R': 5,
-                'M': 'M', 'S': 'S', 'E': 'E'}
-    
-    # Map faces to their appropriate radius index (0=inner, 2=outer)
-    radius_map = {'U': 0, 'D': 2, 'F': 0, 'B': 2, 'L': 2, 'R': 0}
-    
-    for face_code, direction in moves:
-        if face_code in 'UDFBLR':  # Regular face moves
-            face = face_map[face_code]
-            radius_idx = radius_map[face_code]
-            
-            # Rotate the face edges
-            current_points, current_colors = rotate_face(
-                current_points, current_colors, direction, 
-                center=circle_centers[face], radius=circle_radii[radius_idx]
-            )
-            
-            # Dynamically detect corner pieces for this specific layer
-            corner_groups = detect_layer_corners(
-                current_points, centerpieces[face], 
-                circle_radii[radius_idx], face_code
-            )
-            
-            # Rotate the corners
-            if corner_groups:
-                current_points, current_colors = rotate_facelet(
-                    current_points, current_colors, corner_groups, direction
-                )
-            
-        else:  # Middle slice moves
-            if face_code == 'M':
-                current_points, current_colors = rotate_face(
-                    current_points, current_colors, direction, 
-                    center=centers[2], radius=circle_radii[1]
-                )
-            elif face_code == 'S':
-                current_points, current_colors = rotate_face(
-                    current_points, current_colors, direction, 
-                    center=centers[1], radius=circle_radii[1]
-                )
-            elif face_code == 'E':
-                current_points, current_colors = rotate_face(
-                    current_points, current_colors, direction, 
-                    center=centers[0], radius=circle_radii[1]
-                )
-    
-    return current_points, current_colors
+    return points, current_colors
 
 def detect_layer_corners(points, centerpieces, layer_radius, face_code):
     """
@@ -415,10 +674,8 @@ def detect_layer_corners(points, centerpieces, layer_radius, face_code):
     }
     
     face = face_map[face_code]
-    print('def detect_layer_corners',face)
-    print(centerpieces)
-    print('centerx', centerpieces[0][0], 'centery' ,centerpieces[0][1] )
-    print('len(points)' , len(points))
+    logger.debug('detect_layer_corners %s centerpieces %s', face, centerpieces)
+    logger.debug('centerx %s centery %s, %d points', centerpieces[0][0], centerpieces[0][1], len(points))
     # Find points that could be corners for this layer
     corner_candidates = []
     for i, point in enumerate(points):
@@ -440,7 +697,7 @@ def detect_layer_corners(points, centerpieces, layer_radius, face_code):
     
     # Group into 4 sets of 2 points with their angles
     groups_with_angles = [sorted_indices_with_angles[i:i+2] for i in range(0, 8, 2)]
-    print('4 sets',groups_with_angles)
+    logger.debug('4 sets %s', groups_with_angles)
     # For each group, extract just the indices
     corner_groups = []
     for group in groups_with_angles:
@@ -449,7 +706,7 @@ def detect_layer_corners(points, centerpieces, layer_radius, face_code):
 
     # We should ideally have 4 groups
     if len(corner_groups) != 4:
-        print(f"Warning: Expected 4 corner groups, found {len(corner_groups)}")
+        logger.warning("Expected 4 corner groups, found %d", len(corner_groups))
     
     return corner_groups
 
@@ -464,7 +721,7 @@ def rotate_face(points, colors, direction, center ,radius):
 
     # We should have exactly 12 points
     if len(face_indices) != 12:
-        print(f"Warning: Expected 12 points on inner circle of  face, found {len(face_indices)}")
+        logger.warning("Expected 12 points on inner circle of face, found %d", len(face_indices))
     
     # Enhanced grouping for  face - grouping points based on proximity and position
     # Calculate the angle of each point relative to the  center
@@ -473,16 +730,21 @@ def rotate_face(points, colors, direction, center ,radius):
                    for i in face_indices]     
     # Sort points by angle to get them in order around the circle
     point_angles.sort(key=lambda x: x[1])
+    # Start right after the widest angular gap: a face row may straddle the
+    # -pi/pi cut, which would otherwise split it across two groups
+    gaps = [(point_angles[(k + 1) % len(point_angles)][1] - point_angles[k][1]) % (2 * np.pi)
+            for k in range(len(point_angles))]
+    start = (int(np.argmax(gaps)) + 1) % len(point_angles)
+    point_angles = point_angles[start:] + point_angles[:start]
     sorted_indices_with_angles = [(idx, angle) for idx, angle in point_angles]
     
     # Group into 4 sets of 3 points with their angles
     groups_with_angles = [sorted_indices_with_angles[i:i+3] for i in range(0, 12, 3)]
     
-    # For each group, sort by angle again (may not be necessary if already sorted)
+    # Groups are already in circle order; sorting them again by raw angle
+    # would undo the alignment above
     groups = []
     for group in groups_with_angles:
-        # Sort each group by angle
-        group.sort(key=lambda x: x[1])
         # Extract just the indices
         sorted_group = [idx for idx, angle in group]
         groups.append(sorted_group)
@@ -503,7 +765,7 @@ def rotate_face(points, colors, direction, center ,radius):
             new_colors[orig_group[j]] = colors[new_group[j]]
     return points, new_colors
 
-def rotate_facelet( points, colors, corner_groups, direction ):  
+def rotate_facelet( points, colors, corner_groups, direction, face_code ):  
     new_colors = colors.copy()
     if direction == 'cw' and face_code in ("UFR"):
         shifted_groups = corner_groups[1:] + [corner_groups[0]]
@@ -516,10 +778,10 @@ def rotate_facelet( points, colors, corner_groups, direction ):
         shifted_groups = corner_groups[1:] + [corner_groups[0]]
  
     # Apply the rotation by moving colors between groups
-    for i, (orig_group, new_group) in enumerate(zip(groups, shifted_groups)):
+    for i, (orig_group, new_group) in enumerate(zip(corner_groups, shifted_groups)):
         for j in range(len(orig_group)):
             new_colors[orig_group[j]] = colors[new_group[j]]
-    print('facelet_shifted',shifted_groups)
+    logger.debug('facelet_shifted %s', shifted_groups)
 
     return points, new_colors
 
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Stage timers and counters (parse, geometry, move, render...) with a
+# Chrome trace output; free when profiling is off
+# =====================================================================
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+# The profiler; span, count and profiled are imported by name where they instrument code
+__all__ = ['Profiler', 'enable_profiling', 'disable_profiling', 'get_profiler', 'format_summary']
+
+# Shared by every span while profiling is off, so that `with span(...)` costs almost nothing
+_NO_SPAN = nullcontext()
+
+class Profiler:
+    """
+    Timed spans and counters of one process.
+
+    Spans are kept as Chrome trace "complete" events, which chrome://tracing
+    and Perfetto display on a timeline; summary() aggregates them per stage.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.counters = {}
+
+    def span(self, name, stage):
+        return _Span(self, name, stage)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, stage, start, end=None):
+        """Add a span from its perf_counter start (and end, default now)."""
+        if end is None:
+            end = time.perf_counter()
+        self.events.append({
+            'name': name, 'cat': stage, 'ph': 'X',
+            'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+            'pid': os.getpid(), 'tid': threading.get_ident()})
+
+    def summary(self):
+        """Per stage and span name: calls, total, mean and max seconds."""
+        stages = {}
+        for event in self.events:
+            entry = stages.setdefault(event['cat'], {}).setdefault(
+                event['name'], {'calls': 0, 'seconds': 0.0, 'max': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += event['dur'] / 1e6
+            entry['max'] = max(entry['max'], event['dur'] / 1e6)
+        for spans in stages.values():
+            for entry in spans.values():
+                entry['mean'] = entry['seconds'] / entry['calls']
+        return stages
+
+    def chrome_trace(self):
+        """The spans as a Chrome trace, with the counters and the summary as extra data."""
+        end = (time.perf_counter() - self.origin) * 1e6
+        counters = [{'name': name, 'ph': 'C', 'ts': end, 'pid': os.getpid(), 'tid': 0, 'args': {name: value}}
+                    for name, value in self.counters.items()]
+        return {'traceEvents': self.events + counters, 'displayTimeUnit': 'ms',
+                'otherData': {'counters': self.counters, 'stages': self.summary()}}
+
+    def write(self, filename):
+        """Write the Chrome trace JSON file."""
+        with open(filename, 'w', encoding='utf-8') as target:
+            json.dump(self.chrome_trace(), target)
+        return filename
+
+class _Span:
+    """Context manager recording one complete event."""
+    __slots__ = ('profiler', 'name', 'stage', 'start')
+
+    def __init__(self, profiler, name, stage):
+        self.profiler, self.name, self.stage = profiler, name, stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.stage, self.start)
+        return False
+
+# Profiler of this process, None while profiling is off
+_profiler = None
+
+def enable_profiling():
+    """Start recording spans and counters in this process; return the profiler."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+def disable_profiling():
+    """Stop recording; return the profiler that was recording, if any."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+def get_profiler():
+    """Profiler of this process, None while profiling is off."""
+    return _profiler
+
+def span(name, stage):
+    """
+    Time a block as one event of a stage, e.g. `with span('perform_moves', 'move'):`.
+
+    :param name: what is timed, usually the function name
+    :param stage: one of 'parse', 'geometry', 'move', 'solve', 'render', 'encode'
+    """
+    if _profiler is None:
+        return _NO_SPAN
+    return _Span(_profiler, name, stage)
+
+def profiled(stage):
+    """Decorator timing every call of a function as a span of the stage."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            with _Span(_profiler, function.__qualname__, stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def start_span():
+    """
+    Start time of a span, None while profiling is off; see end_span.
+
+    For functions of a few microseconds, where a with block or a decorator
+    would cost as much as the function itself.
+    """
+    return None if _profiler is None else time.perf_counter()
+
+def end_span(start, name, stage, counter=None, amount=1):
+    """Record the span begun by start_span, and count amount in counter; nothing when start is None."""
+    if start is not None and _profiler is not None:
+        _profiler.record(name, stage, start)
+        if counter:
+            _profiler.count(counter, amount)
+
+def count(name, amount=1):
+    """Add amount to a counter, e.g. moves applied or frames drawn."""
+    if _profiler is not None:
+        _profiler.count(name, amount)
+
+def format_summary(profiler):
+    """Lines of a table of the time spent per stage and span, slowest stage first."""
+    stages = profiler.summary()
+    totals = {stage: sum(entry['seconds'] for entry in spans.values()) for stage, spans in stages.items()}
+    lines = []
+    for stage in sorted(stages, key=totals.get, reverse=True):
+        lines.append(f'{stage:<10}{totals[stage] * 1000:10.1f} ms')
+        for name, entry in sorted(stages[stage].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"  {name:<28}{entry['seconds'] * 1000:10.1f} ms {entry['calls']:7d} calls")
+    for name, value in sorted(profiler.counters.items()):
+        lines.append(f'{name:<30}{value:10d}')
+    return lines
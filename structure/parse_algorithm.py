@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Parse Rubik's Cube notation and compile it into a single permutation
+# =====================================================================
+from functools import lru_cache
+
+from .framesetup import compose_moves, get_cube_tables, move_layers
+from .instrument import end_span, profiled, start_span
+
+__all__ = ['INVERSE_MARKS', 'FACE_MOVES', 'WHOLE_CUBE_MOVES', 'WIDE_FACES', 'parse_algorithm',
+           'format_moves', 'invert_algorithm', 'compile_algorithm']
+
+# Inverse markers: 'i' as in the README, the usual prime, and '!'
+INVERSE_MARKS = "i'!"
+
+# Face and middle slice moves
+FACE_MOVES = 'UDFBLRMES'
+
+# Whole cube rotations, turning like R, U and F
+WHOLE_CUBE_MOVES = 'xyz'
+# Wide moves in lowercase: 'r' is 'Rw', the two outer layers of R
+WIDE_FACES = 'udfblr'
+
+def parse_algorithm(notation_string, n=None):
+    """
+    Parse Rubik's Cube notation into a list of moves.
+
+    'R' gives [('R', 'cw')], 'Ri' the opposite direction and 'R2' two moves.
+    B, D, L and the M, E slices turn 'ccw' in the Venn diagram by default.
+    Bigger cubes use layer numbers before the face: '2R' turns the second
+    layer only and gives ('R', 'cw', (2,)); 'Rw' (or 'r') turns the two outer
+    layers and '3Rw' the three outer ones, ('R', 'cw', (1, 2, 3)).
+    x, y and z turn the whole cube like R, U and F.
+
+    :param n: size of the cube the moves are for; when given, the layer
+              numbers are checked against it
+    :raises ValueError: on a letter that is no move, a number without a move
+                        or a layer number on x, y or z, or on layers the cube
+                        does not have, naming the offending move
+    """
+    started = start_span()
+    moves = []
+    i = 0
+    while i < len(notation_string):
+        start = i
+        # Layer number before the face, as in 2R or 3Rw
+        depth = 0
+        while i < len(notation_string) and notation_string[i].isdigit():
+            depth = 10 * depth + int(notation_string[i])
+            i += 1
+        if i > start and (i == len(notation_string) or not notation_string[i].isalpha()):
+            # A dangling number, as in R 2 or R22: no guess at what was meant
+            raise ValueError(f"number {notation_string[start:i]!r} without a move in {notation_string!r}")
+        if i == len(notation_string):
+            break
+
+        # Get the current character (face)
+        char = notation_string[i]
+        i += 1
+        
+        # Skip non-alphabetic characters (spaces, separators)
+        if not char.isalpha():
+            continue
+            
+        if char not in FACE_MOVES + WIDE_FACES + WHOLE_CUBE_MOVES:
+            raise ValueError(f"unknown move {notation_string[start:i]!r} in {notation_string!r}")
+        if i - 1 > start and (depth == 0 or char in WHOLE_CUBE_MOVES):
+            # Layers are counted from 1, and x, y, z turn the whole cube
+            raise ValueError(f"no layer {notation_string[start:i]!r} in {notation_string!r}")
+
+        # Keep the face as is, but a lowercase face is a wide move
+        face = char
+        wide = face in WIDE_FACES
+        if wide:
+            face = face.upper()
+        elif i < len(notation_string) and notation_string[i] == 'w' and face not in WHOLE_CUBE_MOVES:
+            wide = True
+            i += 1
+        
+        # For B, D, L and the M, E slices the default direction is counterclockwise
+        if face in "BDLME":
+            direction = 'ccw'
+        else:
+            direction = 'cw'
+            
+        # Check for the inverse symbol which indicates the opposite of default direction
+        if i < len(notation_string) and notation_string[i] in INVERSE_MARKS:
+            # Flip the direction
+            direction = 'cw' if direction == 'ccw' else 'ccw'
+            i += 1
+            
+        # Check for repetition
+        repetitions = 1
+        if i < len(notation_string) and notation_string[i].isdigit():
+            repetitions = int(notation_string[i])
+            i += 1
+
+        # Layers turned, counted from the face; the outer one alone is a plain move
+        if wide:
+            depths = tuple(range(1, (depth or 2) + 1))
+        else:
+            depths = (depth or 1,)
+        move = (face, direction) if depths == (1,) else (face, direction, depths)
+        if n is not None:
+            try:
+                move_layers(face, n, depths)
+            except ValueError as error:
+                raise ValueError(f"move {notation_string[start:i]!r}: {error}") from None
+            
+        # Add the move(s) to the list
+        for _ in range(repetitions):
+            moves.append(move)
+    end_span(started, 'parse_algorithm', 'parse', 'parsed moves', len(moves))
+            
+    return moves
+
+def format_moves(moves):
+    """
+    Notation of a list of moves, the inverse of parse_algorithm.
+
+    Repeated moves are written with their count, e.g. 'R2' or 'Ui3';
+    a half turn is written in its default direction.
+    """
+    notation = []
+    i = 0
+    while i < len(moves):
+        move = moves[i]
+        run = 1
+        while i + run < len(moves) and moves[i + run] == move and run < 9:
+            run += 1
+        i += run
+        face, direction = move[:2]
+        depths = move[2] if len(move) > 2 else (1,)
+        if len(depths) > 1:
+            text = (str(len(depths)) if len(depths) > 2 else '') + face + 'w'
+        else:
+            text = (str(depths[0]) if depths[0] > 1 else '') + face
+        if run != 2 and direction != ('ccw' if face in "BDLME" else 'cw'):
+            text += 'i'
+        if notation and text[0].isdigit():
+            # Else the layer number would read as the repetition of the move before
+            text = ' ' + text
+        notation.append(text + (str(run) if run > 1 else ''))
+    return ''.join(notation)
+
+def invert_algorithm(notation_string):
+    """Notation of the algorithm undoing notation_string: its moves reversed, each one inverted."""
+    moves = parse_algorithm(notation_string)
+    return format_moves([(move[0], 'cw' if move[1] == 'ccw' else 'ccw') + move[2:] for move in reversed(moves)])
+
+@lru_cache(maxsize=1024)
+@profiled('parse')
+def compile_algorithm(notation_string, n=3):
+    """
+    Compile an algorithm into one permutation, cached by its notation string
+    and the size n of the cube.
+
+    Applying it is a single gather whatever the algorithm length:
+    colors_after = colors_before[compile_algorithm('RURiURU2Ri')]
+    The returned array is shared between calls and therefore read-only.
+    """
+    perm = compose_moves(parse_algorithm(notation_string, n), get_cube_tables(n))
+    perm.setflags(write=False)
+    return perm
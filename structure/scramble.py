@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Random scrambles and a batch solvability check of cube states
+# =====================================================================
+import numpy as np
+
+from .cubies import get_cubie_facelets, cubies_to_state
+from .framesetup import CORNER_COLORS, get_face_colors, get_geometry
+from .parse_algorithm import invert_algorithm
+from .solver import solve
+
+__all__ = ['SCRAMBLE_FACES', 'SCRAMBLE_MARKS', 'CHECK_CHUNK', 'random_scramble',
+           'permutation_parity', 'random_cubies', 'random_states', 'random_state_scramble',
+           'validate_states', 'is_solvable']
+
+# Faces and direction marks of the random-move scrambles
+SCRAMBLE_FACES = 'UDFBLRMES'
+SCRAMBLE_MARKS = ('', 'i', '2')
+# States checked at once by validate_states, so that the temporaries stay in the CPU cache
+CHECK_CHUNK = 1 << 12
+
+def random_scramble(length, rng=None, faces=SCRAMBLE_FACES):
+    """Notation of `length` random moves, never twice the same face in a row."""
+    rng = np.random.default_rng() if rng is None else rng
+    notation, previous = [], None
+    for _ in range(length):
+        face = rng.choice([face for face in faces if face != previous])
+        notation.append(face + SCRAMBLE_MARKS[rng.integers(len(SCRAMBLE_MARKS))])
+        previous = face
+    return ''.join(notation)
+
+# Parity of the number of bits of every 16-bit integer
+_BIT_PARITY = (np.unpackbits(np.arange(1 << 16, dtype='>u2').view(np.uint8)).reshape(-1, 16).sum(axis=1) % 2
+               ).astype(np.uint8)
+
+def permutation_parity(perms, axis=-1):
+    """
+    0 for even and 1 for odd permutations of at most 16 elements, along axis.
+
+    Walks the permutations one position at a time, keeping the set of values
+    already seen as a bit mask: the inversions of a value are the bits of the
+    mask above it, and only their parity matters.
+    """
+    columns = np.moveaxis(np.asarray(perms), axis, 0)
+    seen = np.zeros(columns.shape[1:], dtype=np.int32)
+    parity = np.zeros(columns.shape[1:], dtype=np.uint8)
+    for value in columns.astype(np.int32):
+        parity ^= _BIT_PARITY[seen >> (value + 1)]
+        seen |= 1 << value
+    return parity
+
+def random_cubies(count, rng=None):
+    """
+    Uniformly random reachable cubie descriptions.
+
+    Every permutation and orientation is equally likely, under the three
+    constraints of the cube group: the corner twists sum to 0 mod 3, the
+    edge flips to 0 mod 2, and the corner and edge permutations have the
+    same parity (two edges are swapped when they do not).
+
+    :return: (cp, co, ep, eo) arrays of shapes (count, 8) and (count, 12)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    cp = np.argsort(rng.random((count, 8)), axis=1)
+    ep = np.argsort(rng.random((count, 12)), axis=1)
+    odd = permutation_parity(cp) != permutation_parity(ep)
+    ep[odd, -2:] = ep[odd, -2:][:, ::-1]
+    co = rng.integers(3, size=(count, 8))
+    co[:, -1] = -co[:, :-1].sum(axis=1) % 3
+    eo = rng.integers(2, size=(count, 12))
+    eo[:, -1] = eo[:, :-1].sum(axis=1) % 2
+    return cp, co, ep, eo
+
+def random_states(count, fur='RWB', rng=None):
+    """
+    Uniformly random reachable states of a corner orientation.
+
+    :param fur: corner orientation of the centers, one of CORNER_COLORS
+    :return: (count, nodes) uint8 states
+    """
+    return cubies_to_state(*random_cubies(count, rng), get_face_colors(fur))
+
+def random_state_scramble(rng=None):
+    """
+    Notation of a scramble reaching a uniformly random state: the inverse of
+    its solution, so at most 22 face moves. Uses the solver tables.
+    """
+    state = random_states(1, rng=rng)[0]
+    return invert_algorithm(solve(state))
+
+# Lookup tables of validate_states, built once by _get_check_tables()
+_check_tables = None
+
+def _base6(digits, axis=-1):
+    """Codes in base 6 of the digits along axis, e.g. the colors of the stickers of a cubie."""
+    digits = np.moveaxis(np.asarray(digits), axis, 0).astype(np.int32)
+    code = digits[0]
+    for digit in digits[1:]:
+        code = code * 6 + digit
+    return code
+
+def _get_check_tables():
+    """
+    Dense lookup tables of validate_states, indexed by colors in base 6.
+
+    'centers' gives the corner orientation (index into CORNER_COLORS) of the
+    six center colors, -1 for the arrangements no cube has. 'corners' and
+    'edges' give, per orientation, piece * size + orientation of the colors
+    of a slot, -1 for the colors no cubie has, mirrored corners included;
+    'corners piece' and 'corners orientation' split those codes (likewise
+    for the edges), with a last entry of 0 for -1.
+    """
+    global _check_tables
+    if _check_tables is None:
+        facelets = get_cubie_facelets()
+        faces = get_geometry()['faces']
+        tables = {'centers': np.full(6 ** 6, -1, dtype=np.int8)}
+        for kind, size in (('corners', 3), ('edges', 2)):
+            tables[kind] = np.full((len(CORNER_COLORS), 6 ** size), -1, dtype=np.int8)
+        for index, fur in enumerate(CORNER_COLORS):
+            face_colors = np.asarray(get_face_colors(fur))
+            tables['centers'][_base6(face_colors)] = index
+            for kind, size in (('corners', 3), ('edges', 2)):
+                for piece, nodes in enumerate(facelets[kind]):
+                    for orientation in range(size):
+                        colors = face_colors[np.roll(faces[nodes], orientation)]
+                        tables[kind][index, _base6(colors)] = piece * size + orientation
+        for kind, size in (('corners', 3), ('edges', 2)):
+            codes = np.arange(len(facelets[kind]) * size + 1) % (len(facelets[kind]) * size)
+            tables[kind + ' piece'] = (codes // size).astype(np.int8)
+            tables[kind + ' orientation'] = (codes % size).astype(np.int8)
+        _check_tables = tables
+    return _check_tables
+
+def validate_states(states):
+    """
+    Check that states are reachable from solved, whole arrays at a time.
+
+    A state is solvable when its centers are those of one of the 24 corner
+    orientations, every corner and edge slot holds a real cubie (not a
+    mirrored one) and every cubie is in exactly one slot, the corner twists
+    and edge flips sum to zero, and the corner and edge permutations have
+    the same parity. The cubies are read off the colors with one table
+    lookup per slot, so millions of states are checked per second.
+
+    :param states: (nodes,) state or (count, nodes) states
+    :return: dict of boolean arrays of shape (count,), one per condition:
+             'centers', 'pieces', 'twist', 'flip' and 'parity'
+    """
+    states = np.asarray(states, dtype=np.uint8)
+    states = states.reshape(-1, states.shape[-1])
+    tables = _get_check_tables()
+    facelets = get_cubie_facelets()
+    checks = {name: np.zeros(len(states), dtype=bool) for name in ('centers', 'pieces', 'twist', 'flip', 'parity')}
+    for start in range(0, len(states), CHECK_CHUNK):
+        # One row per node, so that the stickers of a slot are contiguous rows
+        nodes = np.ascontiguousarray(states[start:start + CHECK_CHUNK].T)
+        rows = slice(start, start + nodes.shape[1])
+        orientation_index = tables['centers'][_base6(nodes[facelets['centers']], axis=0)]
+        checks['centers'][rows] = orientation_index >= 0
+        orientation_index = np.maximum(orientation_index, 0).astype(np.int32)
+        pieces, parities, sums = [], [], []
+        for kind, size in (('corners', 3), ('edges', 2)):
+            # (slots, states) codes, -1 where the colors are no cubie
+            lookup = tables[kind]
+            codes = np.take(lookup, orientation_index * lookup.shape[1] + _base6(nodes[facelets[kind]], axis=1))
+            # Index -1 reads the last entry, piece and orientation 0
+            perm, orientation = np.take(tables[kind + ' piece'], codes), np.take(tables[kind + ' orientation'], codes)
+            # Every slot holds a cubie, and no cubie is in two slots
+            found = np.bitwise_or.reduce(np.left_shift(1, perm, dtype=np.int32), axis=0)
+            pieces.append((codes.min(axis=0) >= 0) & (found == (1 << len(perm)) - 1))
+            parities.append(permutation_parity(perm, axis=0))
+            sums.append(orientation.sum(axis=0, dtype=np.int32) % size == 0)
+        checks['pieces'][rows] = pieces[0] & pieces[1]
+        checks['twist'][rows], checks['flip'][rows] = sums
+        checks['parity'][rows] = parities[0] == parities[1]
+    return checks
+
+def is_solvable(states):
+    """True for every solvable state, see validate_states; a bool for a single state."""
+    checks = validate_states(states)
+    solvable = np.logical_and.reduce(list(checks.values()))
+    return bool(solvable[0]) if np.ndim(states) == 1 else solvable
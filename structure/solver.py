@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Two-phase solver (Kociemba): solve a Venn state with face moves
+#
+# Phase 1 brings the cube into the subgroup <U, D, R2, L2, F2, B2>
+# (corners and edges oriented, slice edges in the slice), phase 2 solves
+# it inside that subgroup. Both searches are IDA* guided by pruning
+# tables, which are built once, saved as .npy files and memory-mapped.
+# =====================================================================
+import itertools
+import os
+import time
+from math import factorial
+
+import numpy as np
+
+from .instrument import profiled
+from .cubies import get_cubie_facelets, perm_to_cubies, state_to_cubies
+from .parse_algorithm import compile_algorithm
+
+__all__ = ['SOLVER_TABLES_ENV', 'DEFAULT_TABLES_DIR', 'SOLVER_FACES', 'MOVE_NAMES', 'N_MOVES',
+           'PHASE2_MOVES', 'N_TWIST', 'N_FLIP', 'N_SLICE', 'N_CORNER_PERM', 'N_EDGE_PERM',
+           'N_SLICE_PERM', 'PHASE2_MAX_DEPTH', 'PHASE1_EXTRA_DEPTH', 'permutation_rank', 'coordinates', 'cubie_moves',
+           'build_coordinate_tables', 'build_pruning_table', 'build_solver_tables',
+           'save_solver_tables', 'load_solver_tables', 'Solver', 'get_solver', 'solve']
+
+# Environment variable naming the folder of the solver tables
+SOLVER_TABLES_ENV = 'RUBIKS_SOLVER_TABLES'
+DEFAULT_TABLES_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'rubiks_illustrator', 'solver')
+
+# The 18 face moves in the notation of parse_algorithm; opposite faces
+# are 3 apart, so a move's axis is (index // 3) % 3
+SOLVER_FACES = 'URFDLB'
+MOVE_NAMES = tuple(face + power for face in SOLVER_FACES for power in ('', '2', 'i'))
+N_MOVES = len(MOVE_NAMES)
+# Moves of the phase 2 subgroup
+PHASE2_MOVES = tuple(MOVE_NAMES.index(name) for name in
+                     ('U', 'U2', 'Ui', 'D', 'D2', 'Di', 'R2', 'F2', 'L2', 'B2'))
+
+N_TWIST = 3 ** 7            # corner orientations
+N_FLIP = 2 ** 11            # edge orientations
+N_SLICE = 495               # positions of the 4 slice edges, C(12, 4)
+N_CORNER_PERM = factorial(8)
+N_EDGE_PERM = factorial(8)  # U and D layer edges, in phase 2
+N_SLICE_PERM = factorial(4)
+# Phase 2 is only tried up to this depth: deep phase 2 searches are slow,
+# and a longer phase 1 usually leads to a shorter phase 2
+PHASE2_MAX_DEPTH = 12
+# After the first solution, phase 1 goes this many moves deeper looking for
+# shorter ones: every phase 1 solution of the same length is still tried,
+# each deeper level costs about ten times more
+PHASE1_EXTRA_DEPTH = 0
+
+# Loaded solvers, one per table folder
+_solvers = {}
+
+def permutation_rank(perms):
+    """Lexicographic rank of every row of an (n, k) array of permutations."""
+    perms = np.asarray(perms)
+    k = perms.shape[1]
+    later = np.triu(np.ones((k, k), dtype=bool), 1)
+    smaller = ((perms[:, None, :] < perms[:, :, None]) & later).sum(axis=2)
+    return smaller @ np.array([factorial(k - 1 - i) for i in range(k)])
+
+# Rank of every 12-bit mask with 4 bits set (the slice edge positions)
+_SLICE_MASKS = np.array([mask for mask in range(1 << 12) if bin(mask).count('1') == 4])
+_SLICE_RANK = np.full(1 << 12, -1, dtype=np.int64)
+_SLICE_RANK[_SLICE_MASKS] = np.arange(N_SLICE)
+_BITS = 1 << np.arange(12)
+
+def coordinates(cp, co, ep, eo):
+    """Phase 1 coordinates (twist, flip, slice) of a cubie description."""
+    twist = int(np.dot(co[:7], 3 ** np.arange(6, -1, -1)))
+    flip = int(np.dot(eo[:11], 2 ** np.arange(10, -1, -1)))
+    slice_ = int(_SLICE_RANK[_BITS[np.asarray(ep) >= 8].sum()])
+    return twist, flip, slice_
+
+def cubie_moves():
+    """Cubie description (cp, co, ep, eo) of each of the 18 moves, read off the Venn move tables."""
+    facelets = get_cubie_facelets()
+    return [tuple(np.array(part) for part in perm_to_cubies(compile_algorithm(name), facelets))
+            for name in MOVE_NAMES]
+
+def build_coordinate_tables(moves):
+    """
+    Coordinate move tables: table[coordinate, move] is the coordinate after the move.
+
+    Every coordinate value is decoded once into cubies, and each move is one
+    gather over all of them: (s * m).cp[i] = s.cp[m.cp[i]].
+    """
+    tables = {}
+    digits = np.arange(N_TWIST)[:, None] // 3 ** np.arange(6, -1, -1) % 3
+    co = np.hstack([digits, (-digits.sum(axis=1, keepdims=True)) % 3])
+    tables['twist'] = np.stack([((co[:, cp] + mco) % 3)[:, :7] @ 3 ** np.arange(6, -1, -1)
+                                for cp, mco, _, _ in moves], axis=1)
+    digits = np.arange(N_FLIP)[:, None] // 2 ** np.arange(10, -1, -1) % 2
+    eo = np.hstack([digits, digits.sum(axis=1, keepdims=True) % 2])
+    tables['flip'] = np.stack([((eo[:, ep] + meo) % 2)[:, :11] @ 2 ** np.arange(10, -1, -1)
+                               for _, _, ep, meo in moves], axis=1)
+    occupied = (_SLICE_MASKS[:, None] & _BITS) > 0
+    tables['slice'] = np.stack([_SLICE_RANK[occupied[:, ep] @ _BITS] for _, _, ep, _ in moves], axis=1)
+
+    corner_perms = np.array(list(itertools.permutations(range(8))))
+    tables['corner_perm'] = np.stack([permutation_rank(corner_perms[:, cp]) for cp, _, _, _ in moves], axis=1)
+    phase2 = [moves[move] for move in PHASE2_MOVES]
+    tables['edge_perm'] = np.stack([permutation_rank(corner_perms[:, ep[:8]]) for _, _, ep, _ in phase2], axis=1)
+    slice_perms = np.array(list(itertools.permutations(range(4))))
+    tables['slice_perm'] = np.stack([permutation_rank(slice_perms[:, ep[8:] - 8]) for _, _, ep, _ in phase2],
+                                    axis=1)
+    return {name: table.astype(np.uint16) for name, table in tables.items()}
+
+def build_pruning_table(table1, table2, start):
+    """
+    Breadth-first distances over the product of two coordinates.
+
+    :param table1, table2: move tables of the two coordinates, same moves
+    :param start: index of the solved state, coordinate1 * size2 + coordinate2
+    :return: uint8 array of the number of moves to solved, per combined index
+    """
+    size2 = len(table2)
+    distance = np.full(len(table1) * size2, 255, dtype=np.uint8)
+    distance[start] = 0
+    frontier = np.array([start])
+    depth = 0
+    while len(frontier):
+        depth += 1
+        unvisited = np.nonzero(distance == 255)[0]
+        if len(frontier) < len(unvisited):
+            # Forward: mark the neighbors of the last layer
+            neighbors = (table1[frontier // size2].astype(np.int64) * size2 + table2[frontier % size2]).ravel()
+            distance[neighbors[distance[neighbors] == 255]] = depth
+        else:
+            # Backward, once most states are reached: the move set is closed
+            # under inverses, so a state is in the next layer when one of its
+            # neighbors is in the last one
+            neighbors = table1[unvisited // size2].astype(np.int64) * size2 + table2[unvisited % size2]
+            distance[unvisited[(distance[neighbors] == depth - 1).any(axis=1)]] = depth
+        frontier = np.nonzero(distance == depth)[0]
+    return distance
+
+@profiled('solve')
+def build_solver_tables(moves=None):
+    """Build all the move and pruning tables of the solver (a few seconds)."""
+    if moves is None:
+        moves = cubie_moves()
+    tables = build_coordinate_tables(moves)
+    slice_solved = int(_SLICE_RANK[_BITS[8:].sum()])
+    tables['twist_slice'] = build_pruning_table(tables['twist'], tables['slice'], slice_solved)
+    tables['flip_slice'] = build_pruning_table(tables['flip'], tables['slice'], slice_solved)
+    tables['corner_slice'] = build_pruning_table(tables['corner_perm'][:, PHASE2_MOVES], tables['slice_perm'], 0)
+    tables['edge_slice'] = build_pruning_table(tables['edge_perm'], tables['slice_perm'], 0)
+    tables['moves'] = np.array([np.concatenate(move) for move in moves], dtype=np.uint8)
+    return tables
+
+def save_solver_tables(tables, folder):
+    """Write every table to its own .npy file in the folder."""
+    os.makedirs(folder, exist_ok=True)
+    for name, table in tables.items():
+        np.save(os.path.join(folder, f'{name}.npy'), table)
+
+def load_solver_tables(folder, moves=None):
+    """
+    Memory-map the tables saved by save_solver_tables.
+
+    :return: dict of read-only arrays, None when a table is missing or was
+             built for different moves than the current Venn move tables
+    """
+    if moves is None:
+        moves = cubie_moves()
+    names = ('moves', 'twist', 'flip', 'slice', 'corner_perm', 'edge_perm', 'slice_perm',
+             'twist_slice', 'flip_slice', 'corner_slice', 'edge_slice')
+    try:
+        tables = {name: np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r') for name in names}
+    except (OSError, ValueError):
+        return None
+    expected = np.array([np.concatenate(move) for move in moves], dtype=np.uint8)
+    if tables['moves'].shape != expected.shape or not np.array_equal(tables['moves'], expected):
+        return None
+    return tables
+
+class Solver:
+    """
+    Two-phase search over memory-mapped tables.
+
+    The tables are read through flat memoryviews, so the search indexes
+    plain Python integers without copying the files into memory.
+    """
+
+    def __init__(self, tables, moves):
+        flat = {name: memoryview(np.ascontiguousarray(table).reshape(-1)) for name, table in tables.items()
+                if name != 'moves'}
+        self.twist_move, self.flip_move, self.slice_move = flat['twist'], flat['flip'], flat['slice']
+        self.corner_move, self.edge_move = flat['corner_perm'], flat['edge_perm']
+        self.slice_perm_move = flat['slice_perm']
+        self.twist_slice, self.flip_slice = flat['twist_slice'], flat['flip_slice']
+        self.corner_slice, self.edge_slice = flat['corner_slice'], flat['edge_slice']
+        self.edge_moves = [move[2].tolist() for move in moves]
+        # Moves allowed after each move (None: first move): never the same face
+        # twice, and opposite faces only in one order
+        self.allowed = {None: list(range(N_MOVES))}
+        for last in range(N_MOVES):
+            face, axis = last // 3, last // 3 % 3
+            self.allowed[last] = [move for move in range(N_MOVES)
+                                  if move // 3 != face and not (move // 3 % 3 == axis and move // 3 < face)]
+        self.allowed2 = {last: [(k, move) for k, move in enumerate(PHASE2_MOVES) if move in allowed]
+                         for last, allowed in self.allowed.items()}
+
+    @profiled('solve')
+    def solve(self, state, max_length=22, timeout=10.0, extra_depth=PHASE1_EXTRA_DEPTH):
+        """
+        Find a short solution of at most max_length moves.
+
+        Once a solution is found the search goes on, only accepting shorter
+        ones, until phase 1 is extra_depth moves deeper than where the first
+        solution was found, no shorter solution can exist, or the time is up.
+
+        :param state: uint8 color codes, one per node, as given by perform_moves
+        :param max_length: longest accepted solution
+        :param timeout: seconds before giving up, or before returning the best solution so far
+        :param extra_depth: phase 1 depths searched after the first solution
+        :return: move string in the notation of parse_algorithm, e.g. 'R2UiF'
+        :raises ValueError: when the state is not a reachable cube
+        :raises RuntimeError: when no solution is found in time
+        """
+        cp, co, ep, eo = state_to_cubies(state)
+        if sorted(cp) != list(range(8)) or sorted(ep) != list(range(12)):
+            raise ValueError('a cubie appears twice in the state')
+        if sum(co) % 3 or sum(eo) % 2:
+            raise ValueError('a corner is twisted or an edge is flipped')
+        if _parity(cp) != _parity(ep):
+            raise ValueError('two pieces are swapped')
+
+        twist, flip, slice_ = coordinates(cp, co, ep, eo)
+        corner = _rank(cp)
+        deadline = time.perf_counter() + timeout
+        twist_move, flip_move, slice_move = self.twist_move, self.flip_move, self.slice_move
+        corner_move, edge_move, slice_perm_move = self.corner_move, self.edge_move, self.slice_perm_move
+        twist_slice, flip_slice = self.twist_slice, self.flip_slice
+        corner_slice, edge_slice = self.corner_slice, self.edge_slice
+        allowed, allowed2, edge_moves = self.allowed, self.allowed2, self.edge_moves
+        n_phase2 = len(PHASE2_MOVES)
+        # Moves of phase 1, then of phase 2 in reverse order
+        path, tail = [], []
+        # Shortest solution so far; later ones must be shorter
+        best = None
+
+        def phase2(corner, edge, slice_perm, togo, last):
+            for k, move in allowed2[last]:
+                new_corner = corner_move[corner * N_MOVES + move]
+                new_edge = edge_move[edge * n_phase2 + k]
+                new_slice = slice_perm_move[slice_perm * n_phase2 + k]
+                if (corner_slice[new_corner * N_SLICE_PERM + new_slice] >= togo
+                        or edge_slice[new_edge * N_SLICE_PERM + new_slice] >= togo):
+                    continue
+                # Both distances are 0 only on the solved cube
+                if togo == 1 or phase2(new_corner, new_edge, new_slice, togo - 1, move):
+                    tail.append(move)
+                    return True
+            return False
+
+        def start_phase2(corner):
+            nonlocal best, max_length
+            if time.perf_counter() > deadline:
+                raise TimeoutError
+            edges = ep
+            for move in path:
+                edges = [edges[i] for i in edge_moves[move]]
+            edge, slice_perm = _rank(edges[:8]), _rank([e - 8 for e in edges[8:]])
+            bound = max(corner_slice[corner * N_SLICE_PERM + slice_perm],
+                        edge_slice[edge * N_SLICE_PERM + slice_perm])
+            last = path[-1] if path else None
+            for depth in range(bound, min(max_length - len(path), PHASE2_MAX_DEPTH) + 1):
+                if depth == 0 or phase2(corner, edge, slice_perm, depth, last):
+                    best = path + tail[::-1]
+                    tail.clear()
+                    max_length = len(best) - 1
+                    # Stop when no shorter solution can follow
+                    return max_length < len(path)
+            return False
+
+        def phase1(twist, flip, slice_, corner, togo, last):
+            for move in allowed[last]:
+                new_twist = twist_move[twist * N_MOVES + move]
+                new_flip = flip_move[flip * N_MOVES + move]
+                new_slice = slice_move[slice_ * N_MOVES + move]
+                if (twist_slice[new_twist * N_SLICE + new_slice] >= togo
+                        or flip_slice[new_flip * N_SLICE + new_slice] >= togo):
+                    continue
+                new_corner = corner_move[corner * N_MOVES + move]
+                path.append(move)
+                if togo == 1:
+                    # A phase 1 solution ending in a phase 2 move was found one move earlier
+                    found = move not in PHASE2_MOVES and start_phase2(new_corner)
+                else:
+                    found = phase1(new_twist, new_flip, new_slice, new_corner, togo - 1, move)
+                if found:
+                    return True
+                path.pop()
+            return False
+
+        bound = max(twist_slice[twist * N_SLICE + slice_], flip_slice[flip * N_SLICE + slice_])
+        depth, first_depth = bound, None
+        try:
+            while depth <= max_length and (first_depth is None or depth <= first_depth + extra_depth):
+                if start_phase2(corner) if depth == 0 else phase1(twist, flip, slice_, corner, depth, None):
+                    break
+                if best is not None and first_depth is None:
+                    first_depth = depth
+                depth += 1
+        except TimeoutError:
+            if best is None:
+                raise RuntimeError(f'no solution of at most {max_length} moves in time') from None
+        if best is None:
+            raise RuntimeError(f'no solution of at most {max_length} moves')
+        return ''.join(MOVE_NAMES[move] for move in best)
+
+def _rank(perm):
+    """Lexicographic rank of one permutation, like permutation_rank."""
+    rank = 0
+    for i, value in enumerate(perm):
+        rank = rank * (len(perm) - i) + sum(1 for later in perm[i + 1:] if later < value)
+    return rank
+
+def _parity(perm):
+    """0 for an even permutation, 1 for an odd one."""
+    perm = list(perm)
+    return sum(perm[i] > perm[j] for i in range(len(perm)) for j in range(i + 1, len(perm))) % 2
+
+def get_solver(folder=None):
+    """
+    Return the solver, loading its tables once per process.
+
+    The tables are memory-mapped from the folder named by the
+    RUBIKS_SOLVER_TABLES environment variable (default ~/.cache/rubiks_illustrator/solver);
+    they are built and saved there on first use, or when the move tables changed.
+    """
+    folder = folder or os.environ.get(SOLVER_TABLES_ENV) or DEFAULT_TABLES_DIR
+    if folder not in _solvers:
+        moves = cubie_moves()
+        tables = load_solver_tables(folder, moves)
+        if tables is None:
+            save_solver_tables(build_solver_tables(moves), folder)
+            tables = load_solver_tables(folder, moves)
+        _solvers[folder] = Solver(tables, moves)
+    return _solvers[folder]
+
+def solve(state, max_length=22, timeout=10.0):
+    """Solve a state with face moves, see Solver.solve; e.g. state[compile_algorithm(solve(state))] is solved."""
+    return get_solver().solve(state, max_length, timeout)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Compact cube state: one uint8 color code (0-5) per Venn node
+# =====================================================================
+import hashlib
+import numpy as np
+
+from .framesetup import get_color_name
+
+__all__ = ['STATE_DTYPE', 'COLOR_NAMES', 'as_state', 'state_color_names', 'state_string',
+           'color_counts', 'check_color_counts', 'state_key', 'state_hash']
+
+STATE_DTYPE = np.uint8
+# Color names in code order, as used by get_color_name / initialize_cube
+COLOR_NAMES = tuple(get_color_name(code) for code in range(6))
+_COLOR_CODES = {name: code for code, name in enumerate(COLOR_NAMES)}
+
+def as_state(colors):
+    """
+    Convert colors to a state array.
+
+    :param colors: uint8 state, sequence of color codes or of color names
+    :return: np.ndarray of dtype uint8
+    """
+    if isinstance(colors, np.ndarray) and colors.dtype == STATE_DTYPE:
+        return colors
+    colors = list(colors)
+    if colors and isinstance(colors[0], str):
+        colors = [_COLOR_CODES[name] for name in colors]
+    return np.asarray(colors, dtype=STATE_DTYPE)
+
+def state_color_names(state):
+    """Convert a state to the list of color names used for rendering."""
+    return [COLOR_NAMES[code] for code in np.asarray(state).tolist()]
+
+def state_string(state):
+    """One letter per node (W, Y, G, B, O, R), the compact text form of a state."""
+    return ''.join(COLOR_NAMES[code][0].upper() for code in np.asarray(state).tolist())
+
+def color_counts(state):
+    """Count the nodes of each color code, shape (..., 6) for one or many states."""
+    state = np.asarray(state)
+    if state.ndim == 1:
+        return np.bincount(state, minlength=6)
+    # Offset each row so one bincount covers the whole batch
+    offsets = 6 * np.arange(state.shape[0])[:, None]
+    return np.bincount((state + offsets).ravel(), minlength=6 * state.shape[0]).reshape(-1, 6)
+
+def check_color_counts(state, per_color=9):
+    """True when every color appears exactly per_color times (the 6x9 check)."""
+    return bool(np.all(color_counts(state) == per_color))
+
+def state_key(state):
+    """Hashable, comparable key of a state (its raw bytes)."""
+    return as_state(state).tobytes()
+
+def state_hash(state):
+    """Stable 64-bit hash of a state, identical across processes and runs."""
+    digest = hashlib.blake2b(state_key(state), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
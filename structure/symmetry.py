@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# Canonical form of a state up to whole-cube rotations and recoloring
+# =====================================================================
+import numpy as np
+
+from .parse_algorithm import WHOLE_CUBE_MOVES, compile_algorithm
+from .state import STATE_DTYPE, state_hash
+
+__all__ = ['get_rotations', 'relabel_colors', 'canonical_transform', 'canonical_form',
+           'canonical_forms', 'canonical_hash', 'unique_states']
+
+# The 24 rotation permutations, built once by get_rotations()
+_rotations = None
+
+def get_rotations():
+    """
+    The 24 whole-cube rotations as node permutations, identity first.
+
+    They are generated from the parser's x, y and z moves, the same way as
+    any algorithm: rotated = state[rotation].
+    """
+    global _rotations
+    if _rotations is None:
+        generators = [compile_algorithm(rotation) for rotation in WHOLE_CUBE_MOVES]
+        identity = np.arange(len(generators[0]))
+        found = {identity.tobytes(): identity}
+        pending = [identity]
+        while pending:
+            rotation = pending.pop(0)
+            for generator in generators:
+                product = rotation[generator]
+                if product.tobytes() not in found:
+                    found[product.tobytes()] = product
+                    pending.append(product)
+        _rotations = np.array(list(found.values()))
+        _rotations.setflags(write=False)
+    return _rotations
+
+def relabel_colors(states):
+    """
+    Recolor states by order of first appearance: the first node's color becomes 0, the next new color 1...
+
+    Among the 720 recolorings of a state this is the lexicographically smallest.
+
+    :param states: (..., nodes) array of color codes
+    :return: (relabeled states, color map) where relabeled = color_map[..., state]
+    """
+    states = np.asarray(states)
+    nodes = states.shape[-1]
+    # First node of every color, nodes when the color is missing
+    present = states[..., None] == np.arange(6)
+    first = np.where(present.any(axis=-2), present.argmax(axis=-2), nodes)
+    color_map = np.argsort(np.argsort(first, axis=-1, kind='stable'), axis=-1).astype(STATE_DTYPE)
+    relabeled = np.take_along_axis(color_map, states.astype(np.intp), axis=-1)
+    return relabeled, color_map
+
+def canonical_transform(state):
+    """
+    Canonical form of a state, and the symmetry that gives it.
+
+    The canonical form is the lexicographically smallest state over the 24
+    whole-cube rotations and all color relabelings.
+
+    :return: (canonical, rotation, color_map) with canonical == color_map[state[rotation]]
+    """
+    state = np.asarray(state)
+    rotations = get_rotations()
+    candidates, color_maps = relabel_colors(state[rotations])
+    best = _lexicographic_min(candidates[None])[0]
+    return candidates[best], rotations[best], color_maps[best]
+
+def canonical_form(state):
+    """Lexicographically smallest state over the whole-cube rotations and color relabelings."""
+    return canonical_transform(state)[0]
+
+def canonical_forms(states):
+    """Canonical form of every row of an (n, nodes) array of states, vectorized."""
+    states = np.atleast_2d(states)
+    candidates, _ = relabel_colors(states[:, get_rotations()])
+    best = _lexicographic_min(candidates)
+    return candidates[np.arange(len(states)), best]
+
+def canonical_hash(state):
+    """64-bit hash of the canonical form: equal for every rotated or recolored copy of a state."""
+    return state_hash(canonical_form(state))
+
+def unique_states(states):
+    """
+    Indices of one state per symmetry class, in order of first appearance.
+
+    :param states: (n, nodes) array of states, e.g. the end states of a catalog
+    """
+    _, first = np.unique(canonical_forms(states), axis=0, return_index=True)
+    return np.sort(first)
+
+def _lexicographic_min(candidates):
+    """Index of the smallest row for each (n, k, nodes) group of k candidate rows."""
+    remaining = np.ones(candidates.shape[:2], dtype=bool)
+    for column in range(candidates.shape[2]):
+        values = np.where(remaining, candidates[:, :, column], 255)
+        remaining &= values == values.min(axis=1, keepdims=True)
+        if (remaining.sum(axis=1) == 1).all():
+            break
+    return remaining.argmax(axis=1)
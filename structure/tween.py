@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# In-between node positions, to animate the moves along their circles
+# =====================================================================
+import numpy as np
+
+from .framesetup import get_move_center, get_move_tables
+
+__all__ = ['ease_in_out', 'tween_positions']
+
+def ease_in_out(t):
+    """Smoothstep easing: the turn starts and ends at rest."""
+    t = np.asarray(t, dtype=float)
+    return t * t * (3 - 2 * t)
+
+def tween_positions(points, moves, steps, ease=True):
+    """
+    Node positions of the sub-frames of every move, for the whole sequence at once.
+
+    During a move the dot drawn at node i starts at node perm[i], where its
+    color comes from, and turns around the center of the move's circle to
+    node i: the angle and the distance to that center are interpolated, so
+    the dots on the circle follow its arc. Drawn with the colors after the
+    move, sub-frame 0 would be the state before it and sub-frame steps the
+    state after it; sub-frames 1 to steps are returned.
+
+    :param points: (nodes, 2) node positions
+    :param moves: list of moves, as returned by parse_algorithm
+    :param steps: number of sub-frames per move
+    :param ease: ease the turns in and out instead of turning at constant speed
+    :return: (len(moves), steps, nodes, 2) float array
+    """
+    points = np.asarray(points, dtype=float)
+    tables = get_move_tables(points)
+    perms = np.array([tables[move] for move in moves], dtype=np.intp).reshape(len(moves), len(points))
+    pivots = np.array([get_move_center(move[0]) for move in moves], dtype=float).reshape(len(moves), 1, 2)
+
+    start = points[perms] - pivots
+    end = points[None] - pivots
+    start_angle = np.arctan2(start[..., 1], start[..., 0])
+    turn = (np.arctan2(end[..., 1], end[..., 0]) - start_angle + np.pi) % (2 * np.pi) - np.pi
+    # The nodes of a ring are not evenly spaced: the shortest way round takes
+    # most of them the move's way, and the group crossing the widest gap the
+    # other way; that one goes the long way round instead
+    way = np.sign(np.nanmedian(np.where(turn == 0, np.nan, turn), axis=1, keepdims=True))
+    turn = np.where(turn * way < -np.pi / 2, turn + 2 * np.pi * way, turn)
+    start_radius = np.hypot(start[..., 0], start[..., 1])
+    stretch = np.hypot(end[..., 0], end[..., 1]) - start_radius
+
+    t = np.arange(1, steps + 1) / steps
+    if ease:
+        t = ease_in_out(t)
+    t = t[None, :, None]
+    angle = start_angle[:, None] + t * turn[:, None]
+    radius = start_radius[:, None] + t * stretch[:, None]
+    positions = pivots[:, None] + np.stack([radius * np.cos(angle), radius * np.sin(angle)], axis=-1)
+    # Nodes the move leaves in place do not move at all, even by rounding
+    still = perms == np.arange(len(points))
+    return np.where(still[:, None, :, None], points, positions)
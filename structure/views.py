@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+# =====================================================================
+# One cube state, several projections: Venn diagram, 2D net, magic net
+# =====================================================================
+import numpy as np
+
+from .facelets import faces_to_state, state_to_faces
+from .framesetup import cube_size, get_cube_tables
+from .parse_algorithm import parse_algorithm
+
+__all__ = ['MAGIC_NUMBERS', 'get_magic_labels', 'CubeViews']
+
+# Sticker numbers of the magic cube, faces in initialize_cube's order
+# (U, D, F, B, L, R) laid out as in the 2D net; U is the Lo Shu square
+MAGIC_NUMBERS = np.array([
+    [[2, 7, 6], [9, 5, 1], [4, 3, 8]],
+    [[51, 52, 47], [46, 50, 54], [53, 48, 49]],
+    [[26, 21, 22], [19, 23, 27], [24, 25, 20]],
+    [[33, 34, 29], [28, 32, 36], [35, 30, 31]],
+    [[44, 37, 42], [39, 41, 43], [40, 45, 38]],
+    [[13, 18, 11], [12, 14, 16], [17, 10, 15]],
+    ], dtype=np.uint8)
+
+def get_magic_labels():
+    """Magic number of the sticker on every node of the solved 3x3 cube."""
+    return faces_to_state(MAGIC_NUMBERS)
+
+class CubeViews:
+    """
+    A cube state and its projections, for as many frames as moves.
+
+    The state is where the sticker on every node comes from: a move is one
+    gather on it, and the Venn colors, the 2D net of colors and the net of
+    sticker numbers are each one more gather. Nothing is copied per move
+    but that index array.
+    """
+
+    def __init__(self, colors, labels=None):
+        """
+        :param colors: uint8 state to start from, e.g. from generate_initial_points
+        :param labels: number of the sticker on every node at the start,
+                       default the magic numbers on a 3x3 cube
+        """
+        self.start = np.array(colors, dtype=np.uint8)
+        self.start.setflags(write=False)
+        self.n = cube_size(len(self.start))
+        if labels is None and self.n == 3:
+            labels = get_magic_labels()
+        self.labels = None if labels is None else np.asarray(labels)
+        self.tables = get_cube_tables(self.n)
+        self.stickers = np.arange(len(self.start))
+
+    def apply(self, moves):
+        """Apply moves, a list as returned by parse_algorithm or a notation string."""
+        if isinstance(moves, str):
+            moves = parse_algorithm(moves, self.n)
+        for move in moves:
+            self.stickers = self.stickers[self.tables[move]]
+        return self
+
+    @property
+    def colors(self):
+        """Color of every node, the state drawn by the Venn diagram."""
+        return self.start[self.stickers]
+
+    def net(self):
+        """(6, n, n) colors of the 2D net, faces in initialize_cube's order."""
+        return state_to_faces(self.colors)
+
+    def label_net(self):
+        """(6, n, n) sticker numbers of the 2D net, None without labels."""
+        if self.labels is None:
+            return None
+        return state_to_faces(self.labels[self.stickers])
+
+    def is_intact(self):
+        """True when every sticker is on exactly one node, as after any sequence of moves."""
+        return bool(np.array_equal(np.sort(self.stickers), np.arange(len(self.stickers))))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""The two-phase solver brings solved, one-move and random states back to the identity."""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structure import framesetup
+from structure.parse_algorithm import compile_algorithm
+from structure.scramble import random_states
+from structure.solver import SOLVER_FACES, solve
+
+
+def solved_state():
+    cube, face_colors, corner = framesetup.initialize_cube('RWB')
+    return framesetup.generate_initial_points(corner)[1]
+
+
+def face_moves(solution):
+    return sum(char in SOLVER_FACES for char in solution)
+
+
+def test_solved_state():
+    assert solve(solved_state()) == ''
+
+
+def test_one_move():
+    solved = solved_state()
+    for twist in ('R', 'Ui', 'F2', 'Bi'):
+        state = solved[compile_algorithm(twist)]
+        solution = solve(state)
+        assert face_moves(solution) == 1, (twist, solution)
+        assert np.array_equal(state[compile_algorithm(solution)], solved)
+
+
+def test_random_state():
+    solved = solved_state()
+    for state in random_states(3, rng=np.random.default_rng(7)):
+        solution = solve(state)
+        assert face_moves(solution) <= 22
+        assert np.array_equal(state[compile_algorithm(solution)], solved)